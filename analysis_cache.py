@@ -0,0 +1,126 @@
+"""
+Cache of analysis results keyed on the tourism_data version.
+
+``tourism_repository.data_version()`` is bumped by every write that changes
+tourism_data, so an entry stored under (database, name, version) stays
+valid until the data changes and is then simply never asked for again.
+
+Two tiers:
+- memory: an LRU of ``Config.ANALYSIS_CACHE_SIZE`` entries per process
+- disk (optional): one JSON file per (database, name) in
+  ``Config.ANALYSIS_CACHE_DIR``, shared by every worker process on the host.
+  Files are replaced atomically and the file of an older version is
+  overwritten by the next one, so the directory does not grow with uploads.
+
+Values are stored as JSON text and every hit returns a fresh copy, so callers
+may trim or extend the dict they get back. Hits and misses per tier are
+counted in ``stats()``.
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class AnalysisCache:
+    """Memory LRU in front of an optional directory of JSON files"""
+
+    def __init__(self, max_entries=None, directory=None):
+        self.max_entries = max_entries or Config.ANALYSIS_CACHE_SIZE
+        self.directory = directory if directory is not None else Config.ANALYSIS_CACHE_DIR
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0}
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+
+    def get_or_compute(self, db_path, name, version, compute):
+        """
+        Cached ``compute()`` result for this database, name (a region, or
+        e.g. 'forecast:<region>' for other results) and data version
+        """
+        key = (db_path, name, version)
+        with self._lock:
+            text = self._entries.get(key)
+            if text is not None:
+                self._entries.move_to_end(key)
+                self._counters['memory_hits'] += 1
+                return json.loads(text)
+
+        text = self._read_disk(db_path, name, version)
+        if text is not None:
+            self._count('disk_hits')
+        else:
+            self._count('misses')
+            text = json.dumps(compute())
+            self._write_disk(db_path, name, version, text)
+
+        with self._lock:
+            self._entries[key] = text
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return json.loads(text)
+
+    def _count(self, counter):
+        with self._lock:
+            self._counters[counter] += 1
+
+    def _disk_path(self, db_path, name):
+        digest = hashlib.sha256(f"{os.path.abspath(db_path)}\0{name}".encode('utf-8')).hexdigest()[:32]
+        return os.path.join(self.directory, f"analysis_{digest}.json")
+
+    def _read_disk(self, db_path, name, version):
+        if not self.directory:
+            return None
+        try:
+            with open(self._disk_path(db_path, name), encoding='utf-8') as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring unreadable analysis cache file: %s", e)
+            return None
+        if entry.get('version') != version:
+            return None
+        return json.dumps(entry['value'])
+
+    def _write_disk(self, db_path, name, version, text):
+        if not self.directory:
+            return
+        path = self._disk_path(db_path, name)
+        temp_path = None
+        try:
+            fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(f'{{"version": {json.dumps(version)}, "value": {text}}}')
+            os.replace(temp_path, path)
+        except OSError as e:
+            logger.warning("Could not write analysis cache file %s: %s", path, e)
+            if temp_path and os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def clear(self):
+        """Drop the memory tier (the disk tier is invalidated by data versions)"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Hit/miss counters of this process and the memory tier size"""
+        with self._lock:
+            lookups = sum(self._counters.values())
+            hits = self._counters['memory_hits'] + self._counters['disk_hits']
+            return {
+                **self._counters,
+                'hit_rate': round(hits / lookups, 3) if lookups else None,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'disk_dir': self.directory or None
+            }
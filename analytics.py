@@ -0,0 +1,180 @@
+"""
+Analytics queries over the SQLite database.
+
+Aggregations (group-bys, occupancy rates, filtered totals) run as SQL and
+only the small result set comes back as a DataFrame. When DuckDB is installed
+the SQLite file is attached read-only to an in-process DuckDB database and the
+query runs there with columnar scans; otherwise (or if attaching fails) the
+same SQL runs on the regular SQLite connection. DuckDB's sqlite extension is
+installed ahead of time with ``flask install-analytics`` and only loaded
+here, never downloaded while serving a request. Queries therefore stick to
+SQL both engines understand, and cast sums to INTEGER (DuckDB widens them).
+Monthly reports read the trigger-maintained *_monthly_summary tables (see
+migrations.py) instead of re-aggregating the daily rows; exports list the
+daily rows themselves.
+
+Set ``Config.ANALYTICS_BACKEND`` to 'sqlite' to force the fallback.
+"""
+import logging
+import threading
+
+import pandas as pd
+
+from config import Config
+from database import get_connection
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+logger = logging.getLogger(__name__)
+
+_engines = {}
+_engines_lock = threading.Lock()
+_unavailable = set()
+
+
+def _duckdb_engine(db_path):
+    """In-memory DuckDB database with ``db_path`` attached read-only, or None"""
+    if duckdb is None or Config.ANALYTICS_BACKEND == 'sqlite' or db_path in _unavailable:
+        return None
+
+    with _engines_lock:
+        engine = _engines.get(db_path)
+        if engine is None:
+            try:
+                # Never download an extension on the request path; see install_extensions()
+                engine = duckdb.connect(config={'autoinstall_known_extensions': False,
+                                                'autoload_known_extensions': False})
+                engine.execute('LOAD sqlite')
+                engine.execute(f"ATTACH '{db_path}' AS src (TYPE SQLITE, READ_ONLY)")
+                engine.execute('USE src')
+            except duckdb.Error as e:
+                logger.warning("DuckDB analytics unavailable for %s, using SQLite: %s", db_path, e)
+                _unavailable.add(db_path)
+                return None
+            _engines[db_path] = engine
+        return engine
+
+
+def install_extensions():
+    """
+    Download DuckDB's sqlite extension into the local extension directory
+    (``flask install-analytics``; needs network access once per DuckDB
+    version). Returns False when DuckDB is not installed.
+    """
+    if duckdb is None:
+        return False
+    with duckdb.connect() as engine:
+        engine.execute('INSTALL sqlite')
+    with _engines_lock:
+        _unavailable.clear()
+    return True
+
+
+def backend(db_path=None):
+    """Name of the engine analytics queries will run on"""
+    return 'duckdb' if _duckdb_engine(db_path or Config.DATABASE) is not None else 'sqlite'
+
+
+def query(sql, params=(), db_path=None):
+    """Run an aggregate query and return the result as a DataFrame"""
+    db_path = db_path or Config.DATABASE
+    engine = _duckdb_engine(db_path)
+    if engine is not None:
+        # A cursor is a separate connection to the same DuckDB database,
+        # safe to use from the calling thread only.
+        cursor = engine.cursor()
+        try:
+            return cursor.execute(sql, list(params)).df()
+        finally:
+            cursor.close()
+    return pd.read_sql_query(sql, get_connection(db_path), params=list(params))
+
+
+# ===== HOTEL =====
+HOTEL_EXPORT_QUERY = '''
+    SELECT
+        hd.date AS "Tanggal",
+        hi.hotel_name AS "Hotel",
+        u.username AS "Petugas",
+        hd.occupied_rooms AS "Kamar Terisi",
+        hi.total_rooms AS "Total Kamar",
+        CASE WHEN hi.total_rooms > 0
+             THEN ROUND(hd.occupied_rooms * 100.0 / hi.total_rooms, 1)
+             ELSE 0 END AS "Tingkat Okupansi (%)",
+        hd.guest_count AS "Jumlah Tamu"
+    FROM hotel_data hd
+    JOIN hotel_info hi ON hd.user_id = hi.user_id
+    JOIN users u ON hd.user_id = u.id
+    ORDER BY hd.date DESC, hd.id DESC
+'''
+
+HOTEL_MONTHLY_OCCUPANCY_QUERY = '''
+    SELECT
+        s.month AS "Bulan",
+        hi.hotel_name AS "Hotel",
+        CAST(SUM(s.day_count) AS INTEGER) AS "Hari Terisi",
+        CAST(SUM(s.occupied_rooms_sum) AS INTEGER) AS "Total Kamar Terisi",
+        CASE WHEN MAX(hi.total_rooms) > 0
+             THEN ROUND(SUM(s.occupied_rooms_sum) * 100.0 / (SUM(s.day_count) * MAX(hi.total_rooms)), 1)
+             ELSE 0 END AS "Rata-rata Okupansi (%)",
+        CAST(SUM(s.guest_sum) AS INTEGER) AS "Jumlah Tamu"
+    FROM hotel_monthly_summary s
+    JOIN hotel_info hi ON s.user_id = hi.user_id
+    GROUP BY s.month, hi.hotel_name
+    ORDER BY 1 DESC, 2
+'''
+
+
+def hotel_export_rows(db_path=None):
+    """Every hotel_data row with its occupancy rate, newest first"""
+    return query(HOTEL_EXPORT_QUERY, db_path=db_path)
+
+
+def hotel_monthly_occupancy(db_path=None):
+    """Average occupancy and guest totals per hotel per month"""
+    return query(HOTEL_MONTHLY_OCCUPANCY_QUERY, db_path=db_path)
+
+
+# ===== TOURISM SITES =====
+TOURISM_EXPORT_QUERY = '''
+    SELECT
+        td.date AS "Tanggal",
+        td.origin AS "Asal",
+        u.username AS "Petugas",
+        td.total_visitors AS "Total Pengunjung",
+        td.male_adult AS "Dewasa Laki-laki",
+        td.female_adult AS "Dewasa Perempuan",
+        td.male_child AS "Anak Laki-laki",
+        td.female_child AS "Anak Perempuan"
+    FROM tourism_site_data td
+    JOIN users u ON td.user_id = u.id
+    ORDER BY td.date DESC, td.id DESC
+'''
+
+TOURISM_MONTHLY_QUERY = '''
+    SELECT
+        s.month AS "Bulan",
+        u.username AS "Petugas",
+        CAST(SUM(s.day_count) AS INTEGER) AS "Hari",
+        CAST(SUM(s.total_visitors_sum) AS INTEGER) AS "Total Pengunjung",
+        CAST(SUM(s.male_adult_sum + s.female_adult_sum) AS INTEGER) AS "Dewasa",
+        CAST(SUM(s.male_child_sum + s.female_child_sum) AS INTEGER) AS "Anak-anak"
+    FROM tourism_monthly_summary s
+    JOIN users u ON s.user_id = u.id
+    GROUP BY s.month, u.username
+    ORDER BY 1 DESC, 2
+'''
+
+
+def tourism_export_rows(db_path=None):
+    """Every tourism_site_data row, newest first"""
+    return query(TOURISM_EXPORT_QUERY, db_path=db_path)
+
+
+def tourism_monthly_totals(db_path=None):
+    """Visitor totals per tourism officer per month"""
+    return query(TOURISM_MONTHLY_QUERY, db_path=db_path)
+
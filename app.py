@@ -1,7 +1,6 @@
 from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, send_file
 import pandas as pd
 import numpy as np
-import sqlite3
 import os
 from datetime import datetime, timedelta
 import json
@@ -11,6 +10,16 @@ from chart_generator import ChartGenerator
 from pdf_processor import PDFProcessor
 from utils import setup_logging, create_response, validate_year
 from config import Config
+import analysis_cache
+import analytics
+import bulk_import
+import database
+import forecasting
+import jobs
+import migrations
+import tourism_repository
+import upload_cache
+import uploads
 import openpyxl
 from openpyxl.drawing.image import Image
 from openpyxl.styles import Font, PatternFill, Alignment
@@ -24,6 +33,7 @@ matplotlib.use('Agg')  # Important for generating images without GUI
 # Authentication imports
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.utils import secure_filename
 from models import User, HotelData, TourismData
 from decorators import role_required
 from export_utils import (
@@ -31,8 +41,10 @@ from export_utils import (
     export_tourism_to_excel, export_tourism_to_csv, export_tourism_to_pdf
 )
 import random
+import click
 
 app = Flask(__name__)
+app.request_class = uploads.UploadRequest
 app.secret_key = Config.SECRET_KEY
 app.config['UPLOAD_FOLDER'] = Config.UPLOAD_FOLDER
 app.config['DATABASE'] = Config.DATABASE
@@ -46,14 +58,24 @@ login_manager.login_view = 'login'
 login_manager.login_message = 'Silakan login terlebih dahulu'
 login_manager.login_message_category = 'error'
 
+database.init_app(app)
+
 @login_manager.user_loader
 def load_user(user_id):
     return User.get_by_id(Config.DATABASE, int(user_id))
 
 data_processor = DataProcessor(Config.DATABASE)
-ml_analyzer = TourismAnalyzer(Config.DATABASE)
+analysis_results_cache = analysis_cache.AnalysisCache()
+ml_analyzer = TourismAnalyzer(Config.DATABASE, cache=analysis_results_cache)
+forecaster = forecasting.Forecaster(Config.DATABASE, cache=analysis_results_cache)
 chart_generator = ChartGenerator(ml_analyzer)
-pdf_processor = PDFProcessor()
+pdf_processor = PDFProcessor(Config.DATABASE)
+job_queue = jobs.JobQueue(Config.DATABASE)
+
+@app.before_request
+def fail_interrupted_jobs():
+    # Only a serving process gets here (CLI commands run next to a live server)
+    job_queue.fail_interrupted()
 
 setup_logging()
 
@@ -61,90 +83,75 @@ if not os.path.exists(app.config['UPLOAD_FOLDER']):
     os.makedirs(app.config['UPLOAD_FOLDER'])
 
 def init_db():
-    conn = sqlite3.connect(app.config['DATABASE'])
-    cursor = conn.cursor()
-    
-    # Existing tourism_data table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS tourism_data (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            year INTEGER,
-            month TEXT,
-            value INTEGER,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    # Existing uploaded_files table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS uploaded_files (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            filename TEXT,
-            year INTEGER,
-            upload_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    # New users table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT UNIQUE NOT NULL,
-            password_hash TEXT NOT NULL,
-            role TEXT NOT NULL,
-            email TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    # New hotel_info table (stores hotel name and total rooms)
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS hotel_info (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            hotel_name TEXT NOT NULL,
-            total_rooms INTEGER NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users(id)
-        )
-    ''')
-    
-    # New hotel_data table (daily hotel data)
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS hotel_data (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            date TEXT NOT NULL,
-            occupied_rooms INTEGER NOT NULL,
-            guest_count INTEGER NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users(id)
-        )
-    ''')
-    
-    # New tourism_site_data table (renamed from tourism_data to avoid conflict)
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS tourism_site_data (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            date TEXT NOT NULL,
-            origin TEXT NOT NULL,
-            total_visitors INTEGER NOT NULL,
-            male_adult INTEGER NOT NULL,
-            female_adult INTEGER NOT NULL,
-            male_child INTEGER NOT NULL,
-            female_child INTEGER NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users(id)
-        )
-    ''')
-    
+    """Bring the database schema up to the latest migration"""
+    conn = get_db_connection()
+    migrations.upgrade(conn)
+
+@app.cli.command('db-status')
+def db_status_command():
+    """Show applied and pending schema migrations and the SQLite settings in effect"""
+    conn = get_db_connection()
+    print(f"Database: {app.config['DATABASE']} (schema version {migrations.get_version(conn)})")
+    for step in migrations.status(conn):
+        mark = '✅ applied' if step['applied'] else '⏳ pending'
+        print(f"  {step['version']:>3}  {mark}  {step['description']}")
+    print("SQLite settings:")
+    for name, setting in database.check_pragmas(app.config['DATABASE']).items():
+        print(f"  {name:<13} {setting['actual']} (configured: {setting['expected']})")
+
+@app.cli.command('db-upgrade')
+@click.option('--target', type=int, default=None, help='Stop after this schema version')
+def db_upgrade_command(target):
+    """Apply pending schema migrations"""
+    applied = migrations.upgrade(get_db_connection(), target)
+    if applied:
+        print(f"✅ Applied migrations: {', '.join(str(v) for v in applied)}")
+    else:
+        print("Database schema is up to date")
+
+@app.cli.command('rebuild-summaries')
+def rebuild_summaries_command():
+    """Recompute the monthly hotel/tourism summary tables from daily data"""
+    conn = get_db_connection()
+    migrations.rebuild_monthly_summaries(conn)
     conn.commit()
-    conn.close()
+    hotel_rows = conn.execute('SELECT COUNT(*) FROM hotel_monthly_summary').fetchone()[0]
+    tourism_rows = conn.execute('SELECT COUNT(*) FROM tourism_monthly_summary').fetchone()[0]
+    print(f"✅ Rebuilt summaries: {hotel_rows} hotel months, {tourism_rows} tourism months")
+
+@app.cli.command('install-analytics')
+def install_analytics_command():
+    """Install DuckDB's sqlite extension for the analytics queries (needs network access once)"""
+    try:
+        installed = analytics.install_extensions()
+    except Exception as e:
+        print(f"❌ DuckDB sqlite extension could not be installed: {e}")
+        return
+    if not installed:
+        print("DuckDB is not installed; analytics run on SQLite")
+        return
+    print(f"✅ DuckDB sqlite extension installed; analytics backend: {analytics.backend(app.config['DATABASE'])}")
+
+@app.cli.command('import-dir')
+@click.argument('directory', type=click.Path(exists=True, file_okay=False))
+@click.option('--workers', type=int, default=None, help='Parser processes (default: CPU count)')
+@click.option('--batch-size', type=int, default=None, help='Files per transaction')
+def import_dir_command(directory, workers, batch_size):
+    """Import every BPS CSV/XLSX/PDF under DIRECTORY (reruns skip files already imported)"""
+    init_db()
+    report = bulk_import.import_directory(directory, app.config['DATABASE'], workers, batch_size, echo=click.echo)
+    
+    seconds = report['seconds']
+    click.echo(f"✅ {report['imported']} diimpor, {report['skipped']} dilewati (sudah ada), "
+               f"{len(report['failed'])} gagal dari {report['files']} file")
+    click.echo(f"   {report['rows']} baris ({report['changed']} berubah) dalam {seconds:.1f}s "
+               f"({report['files'] / seconds:.1f} file/s, {report['rows'] / seconds:.0f} baris/s)")
+    for path, error in report['failed']:
+        click.echo(f"❌ {path}: {error}")
 
 def create_default_admin():
     """Create default admin user if not exists"""
-    conn = sqlite3.connect(app.config['DATABASE'])
+    conn = get_db_connection()
     cursor = conn.cursor()
     
     # Check if admin exists
@@ -157,13 +164,9 @@ def create_default_admin():
         ''', ('admin', password_hash, 'admin', 'admin@pariwisata.go.id'))
         conn.commit()
         print("✅ Default admin user created (username: admin, password: admin123)")
-    
-    conn.close()
 
 def get_db_connection():
-    conn = sqlite3.connect(app.config['DATABASE'])
-    conn.row_factory = sqlite3.Row
-    return conn
+    return database.get_connection(app.config['DATABASE'])
 
 def get_data_complexity_level():
     conn = get_db_connection()
@@ -171,79 +174,14 @@ def get_data_complexity_level():
     year_count = cursor.fetchone()['year_count']
     cursor = conn.execute('SELECT COUNT(*) as file_count FROM uploaded_files')
     file_count = cursor.fetchone()['file_count']
-    conn.close()
     return max(year_count, file_count)
 
-def process_csv_file_simple(filepath, year):
-    try:
-        df = pd.read_csv(filepath)
-        palembang_data = None
-        for index, row in df.iterrows():
-            for i, cell in enumerate(row):
-                if 'Palembang' in str(cell):
-                    palembang_data = row
-                    break
-            if palembang_data is not None:
-                break
-        
-        if palembang_data is None:
-            return False, "Data Palembang tidak ditemukan"
-        
-        months = ['January', 'February', 'March', 'April', 'May', 'June', 
-                 'July', 'August', 'September', 'October', 'November', 'December']
-        monthly_data = {}
-        
-        for i, month in enumerate(months):
-            if i + 1 < len(palembang_data):
-                value = palembang_data.iloc[i + 1]
-                try:
-                    value_int = int(value) if pd.notna(value) else 0
-                except (ValueError, TypeError):
-                    value_int = 0
-                monthly_data[month] = value_int
-            else:
-                monthly_data[month] = 0
-        
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute('DELETE FROM tourism_data WHERE year = ?', (year,))
-        for month, value in monthly_data.items():
-            cursor.execute(
-                'INSERT INTO tourism_data (year, month, value) VALUES (?, ?, ?)',
-                (year, month, value)
-            )
-        conn.commit()
-        conn.close()
-        
-        total = sum(monthly_data.values())
-        return True, f"Data berhasil diproses. Total pengunjung: {total:,}"
-        
-    except Exception as e:
-        return False, f"Error processing CSV: {str(e)}"
+def selected_region():
+    """Region chosen with ?region=, default Config.DEFAULT_REGION"""
+    return tourism_repository.normalize_region(request.args.get('region') or Config.DEFAULT_REGION)
 
-def analyze_data():
-    conn = get_db_connection()
-    query = '''
-        SELECT year, month, value 
-        FROM tourism_data 
-        ORDER BY year, 
-        CASE month
-            WHEN 'January' THEN 1
-            WHEN 'February' THEN 2
-            WHEN 'March' THEN 3
-            WHEN 'April' THEN 4
-            WHEN 'May' THEN 5
-            WHEN 'June' THEN 6
-            WHEN 'July' THEN 7
-            WHEN 'August' THEN 8
-            WHEN 'September' THEN 9
-            WHEN 'October' THEN 10
-            WHEN 'November' THEN 11
-            WHEN 'December' THEN 12
-        END
-    '''
-    df = pd.read_sql_query(query, conn)
-    conn.close()
+def analyze_data(ml_analysis=None, region=None):
+    df = tourism_repository.get_series(app.config['DATABASE'], region)
     
     if df.empty:
         return {
@@ -281,7 +219,8 @@ def analyze_data():
             })
     
     try:
-        ml_analysis = ml_analyzer.get_detailed_analysis()
+        if ml_analysis is None:
+            ml_analysis = ml_analyzer.get_detailed_analysis(region)
         suggestions = ml_analysis['suggestions'][:3]
     except Exception as e:
         suggestions = ["Sistem analisis sedang disempurnakan"]
@@ -806,8 +745,6 @@ def admin_home():
     cursor = conn.execute('SELECT COUNT(*) as count FROM tourism_data')
     total_ml_data = cursor.fetchone()['count']
     
-    conn.close()
-    
     return render_template('admin/home.html',
                          total_users=total_users,
                          total_hotel_data=total_hotel_data,
@@ -859,154 +796,92 @@ def admin_create_user():
     
     return render_template('admin/create_user.html')
 
+def _admin_page_args(filter_names):
+    """Read page size, keyset cursors and filters for the admin data views"""
+    try:
+        page_size = int(request.args.get('per_page', Config.ADMIN_PAGE_SIZE))
+    except ValueError:
+        page_size = Config.ADMIN_PAGE_SIZE
+    page_size = max(1, min(page_size, Config.ADMIN_MAX_PAGE_SIZE))
+    
+    filters = {name: request.args.get(name, '').strip() for name in filter_names}
+    filters = {name: value for name, value in filters.items() if value}
+    return page_size, request.args.get('after'), request.args.get('before'), filters
+
 @app.route('/admin/hotel-data')
 @login_required
 @role_required('admin')
 def admin_hotel_data():
-    """Admin view all hotel data from all users"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Get all hotel data with user and hotel info
-    cursor.execute('''
-        SELECT 
-            hd.id,
-            hd.date,
-            hd.occupied_rooms,
-            hd.guest_count,
-            hi.hotel_name,
-            hi.total_rooms,
-            u.username,
-            hd.created_at
-        FROM hotel_data hd
-        JOIN hotel_info hi ON hd.user_id = hi.user_id
-        JOIN users u ON hd.user_id = u.id
-        ORDER BY hd.date DESC
-    ''')
-    
-    rows = cursor.fetchall()
-    conn.close()
-    
-    data = []
-    for row in rows:
-        occupancy_rate = (row['occupied_rooms'] / row['total_rooms'] * 100) if row['total_rooms'] > 0 else 0
-        data.append({
-            'id': row['id'],
-            'date': row['date'],
-            'hotel_name': row['hotel_name'],
-            'username': row['username'],
-            'occupied_rooms': row['occupied_rooms'],
-            'total_rooms': row['total_rooms'],
-            'guest_count': row['guest_count'],
-            'occupancy_rate': round(occupancy_rate, 1),
-            'created_at': row['created_at']
-        })
-    
-    return render_template('admin/hotel_data.html', data=data)
+    """Admin view hotel data from all users, one page at a time"""
+    page_size, after, before, filters = _admin_page_args(['hotel_name', 'username', 'date_from', 'date_to'])
+    page = HotelData.get_hotels_data_page(app.config['DATABASE'], page_size, after, before, **filters)
+    summary = HotelData.get_hotels_data_summary(app.config['DATABASE'], **filters)
+    
+    return render_template('admin/hotel_data.html',
+                         data=page['items'],
+                         page=page,
+                         page_size=page_size,
+                         summary=summary,
+                         filters=filters,
+                         hotel_names=HotelData.get_hotel_names(app.config['DATABASE']),
+                         usernames=[u['username'] for u in User.get_all(app.config['DATABASE']) if u['role'] == 'hotel'])
+
+@app.route('/api/admin/hotel-data')
+@login_required
+@role_required('admin')
+def admin_hotel_data_api():
+    """One page of hotel data as JSON (same parameters as /admin/hotel-data)"""
+    page_size, after, before, filters = _admin_page_args(['hotel_name', 'username', 'date_from', 'date_to'])
+    page = HotelData.get_hotels_data_page(app.config['DATABASE'], page_size, after, before, **filters)
+    page['page_size'] = page_size
+    return jsonify(page)
 
 @app.route('/admin/tourism-data')
 @login_required
 @role_required('admin')
 def admin_tourism_data():
-    """Admin view all tourism data from all users"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Get all tourism data with user info
-    cursor.execute('''
-        SELECT 
-            td.id,
-            td.date,
-            td.origin,
-            td.total_visitors,
-            td.male_adult,
-            td.female_adult,
-            td.male_child,
-            td.female_child,
-            u.username,
-            td.created_at
-        FROM tourism_site_data td
-        JOIN users u ON td.user_id = u.id
-        ORDER BY td.date DESC
-    ''')
-    
-    rows = cursor.fetchall()
-    conn.close()
-    
-    data = []
-    for row in rows:
-        total_adults = row['male_adult'] + row['female_adult']
-        total_children = row['male_child'] + row['female_child']
-        data.append({
-            'id': row['id'],
-            'date': row['date'],
-            'origin': row['origin'],
-            'username': row['username'],
-            'total_visitors': row['total_visitors'],
-            'male_adult': row['male_adult'],
-            'female_adult': row['female_adult'],
-            'male_child': row['male_child'],
-            'female_child': row['female_child'],
-            'total_adults': total_adults,
-            'total_children': total_children,
-            'created_at': row['created_at']
-        })
-    
-    return render_template('admin/tourism_data.html', data=data)
+    """Admin view tourism data from all users, one page at a time"""
+    page_size, after, before, filters = _admin_page_args(['username', 'date_from', 'date_to'])
+    page = TourismData.get_tourism_data_page(app.config['DATABASE'], page_size, after, before, **filters)
+    summary = TourismData.get_tourism_data_summary(app.config['DATABASE'], **filters)
+    
+    return render_template('admin/tourism_data.html',
+                         data=page['items'],
+                         page=page,
+                         page_size=page_size,
+                         summary=summary,
+                         filters=filters,
+                         usernames=[u['username'] for u in User.get_all(app.config['DATABASE']) if u['role'] == 'tourism'])
+
+@app.route('/api/admin/tourism-data')
+@login_required
+@role_required('admin')
+def admin_tourism_data_api():
+    """One page of tourism data as JSON (same parameters as /admin/tourism-data)"""
+    page_size, after, before, filters = _admin_page_args(['username', 'date_from', 'date_to'])
+    page = TourismData.get_tourism_data_page(app.config['DATABASE'], page_size, after, before, **filters)
+    page['page_size'] = page_size
+    return jsonify(page)
 
 @app.route('/admin/hotel-data/export/<format>')
 @login_required
 @role_required('admin')
 def admin_export_hotel_data(format):
     """Admin export all hotel data"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Get all hotel data
-    cursor.execute('''
-        SELECT 
-            hd.date,
-            hi.hotel_name,
-            u.username,
-            hd.occupied_rooms,
-            hi.total_rooms,
-            hd.guest_count,
-            hd.created_at
-        FROM hotel_data hd
-        JOIN hotel_info hi ON hd.user_id = hi.user_id
-        JOIN users u ON hd.user_id = u.id
-        ORDER BY hd.date DESC
-    ''')
-    
-    rows = cursor.fetchall()
-    conn.close()
-    
-    # Prepare data
-    data = []
-    for row in rows:
-        occupancy_rate = (row['occupied_rooms'] / row['total_rooms'] * 100) if row['total_rooms'] > 0 else 0
-        data.append({
-            'Tanggal': row['date'],
-            'Hotel': row['hotel_name'],
-            'Petugas': row['username'],
-            'Kamar Terisi': row['occupied_rooms'],
-            'Total Kamar': row['total_rooms'],
-            'Tingkat Okupansi (%)': round(occupancy_rate, 1),
-            'Jumlah Tamu': row['guest_count']
-        })
+    # Occupancy rates are computed by the analytics engine, not per row in Python
+    df = analytics.hotel_export_rows(app.config['DATABASE'])
     
     # Generate filename
     timestamp = datetime.now().strftime('%Y%m%d')
     filename = f"admin_hotel_data_{timestamp}"
     
-    # Create DataFrame for export
-    df = pd.DataFrame(data)
-    
     # Export based on format
     if format == 'excel':
         output = io.BytesIO()
         with pd.ExcelWriter(output, engine='openpyxl') as writer:
             df.to_excel(writer, index=False, sheet_name='Data Hotel')
+            analytics.hotel_monthly_occupancy(app.config['DATABASE']).to_excel(
+                writer, index=False, sheet_name='Rekap Okupansi')
         output.seek(0)
         mimetype = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
         filename += '.xlsx'
@@ -1086,55 +961,19 @@ def admin_export_hotel_data(format):
 @role_required('admin')
 def admin_export_tourism_data(format):
     """Admin export all tourism data"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Get all tourism data
-    cursor.execute('''
-        SELECT 
-            td.date,
-            td.origin,
-            u.username,
-            td.total_visitors,
-            td.male_adult,
-            td.female_adult,
-            td.male_child,
-            td.female_child,
-            td.created_at
-        FROM tourism_site_data td
-        JOIN users u ON td.user_id = u.id
-        ORDER BY td.date DESC
-    ''')
-    
-    rows = cursor.fetchall()
-    conn.close()
-    
-    # Prepare data
-    data = []
-    for row in rows:
-        data.append({
-            'Tanggal': row['date'],
-            'Asal': row['origin'],
-            'Petugas': row['username'],
-            'Total Pengunjung': row['total_visitors'],
-            'Dewasa Laki-laki': row['male_adult'],
-            'Dewasa Perempuan': row['female_adult'],
-            'Anak Laki-laki': row['male_child'],
-            'Anak Perempuan': row['female_child']
-        })
+    df = analytics.tourism_export_rows(app.config['DATABASE'])
     
     # Generate filename
     timestamp = datetime.now().strftime('%Y%m%d')
     filename = f"admin_tourism_data_{timestamp}"
     
-    # Create DataFrame for export
-    df = pd.DataFrame(data)
-    
     # Export based on format
     if format == 'excel':
         output = io.BytesIO()
         with pd.ExcelWriter(output, engine='openpyxl') as writer:
             df.to_excel(writer, index=False, sheet_name='Data Wisata')
+            analytics.tourism_monthly_totals(app.config['DATABASE']).to_excel(
+                writer, index=False, sheet_name='Rekap Bulanan')
         output.seek(0)
         mimetype = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
         filename += '.xlsx'
@@ -1269,6 +1108,101 @@ def admin_edit_user(user_id):
 
 
 
+# ===== BACKGROUND INGESTION =====
+def ingest_csv_job(filepath, year, filename, progress=None, sha256=None):
+    """Validate and import an uploaded CSV or XLSX workbook (runs on the job queue)"""
+    if filepath.endswith('.xlsx'):
+        process = data_processor.process_xlsx_data
+    else:
+        process = data_processor.process_csv_data
+    success, message = process(filepath, year, filename=filename, progress=progress, sha256=sha256)
+    
+    if not success and os.path.exists(filepath):
+        os.remove(filepath)
+    return success, message
+
+def ingest_pdf_job(filepath, year, filename, progress=None, sha256=None):
+    """Extract and import an uploaded PDF (runs on the job queue)"""
+    try:
+        return pdf_processor.process_pdf_for_database(filepath, year, filename, progress=progress, sha256=sha256)
+    finally:
+        if os.path.exists(filepath):
+            os.remove(filepath)
+
+def enqueue_upload(kind, func, filepath, year, filename, endpoint, sha256=None):
+    """
+    Queue an uploaded file for processing. API clients (Accept: application/json)
+    get 202 with the job id; browsers go back to the upload page, which polls it.
+    """
+    try:
+        job_id = job_queue.submit(kind, func, filepath, year, filename, filename=filename, sha256=sha256)
+    except jobs.QueueFull:
+        os.remove(filepath)
+        flash('Antrian proses penuh, silakan coba lagi sebentar lagi', 'error')
+        return redirect(url_for(endpoint))
+    
+    if request.accept_mimetypes.best == 'application/json':
+        return jsonify({'job_id': job_id, 'status_url': url_for('job_status', job_id=job_id)}), 202
+    
+    flash('File diterima dan sedang diproses di latar belakang', 'info')
+    return redirect(url_for(endpoint, job=job_id))
+
+@app.route('/api/jobs/<job_id>')
+@login_required
+@role_required('admin')
+def job_status(job_id):
+    """Status, progress and result message of an upload job"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job tidak ditemukan'}), 404
+    return jsonify(job)
+
+@app.route('/api/upload-preview', methods=['POST'])
+@login_required
+@role_required('admin')
+def upload_preview():
+    """
+    What an upload would import, read from the head of the file only (first
+    Config.PREVIEW_ROWS rows of a CSV/XLSX, first month table of a PDF).
+    Nothing is saved or written to the database.
+    """
+    file = next((request.files[name] for name in ('file', 'csv_file', 'pdf_file') if name in request.files), None)
+    if file is None or file.filename == '':
+        return jsonify({'error': 'Tidak ada file yang dipilih'}), 400
+    
+    extension = os.path.splitext(file.filename)[1].lower()
+    sniffers = {
+        '.csv': data_processor.sniff_csv_header,
+        '.xlsx': data_processor.sniff_xlsx_header,
+        '.pdf': pdf_processor.sniff_pdf_header
+    }
+    if extension not in sniffers:
+        return jsonify({'error': 'File harus berformat CSV, XLSX atau PDF'}), 400
+    
+    head = file.stream.read(uploads.SNIFF_SIZE)
+    file.stream.seek(0)
+    valid, message = sniffers[extension](head)
+    if not valid:
+        return jsonify({'error': message}), 400
+    
+    region = request.form.get('region')
+    try:
+        if extension == '.pdf':
+            preview = pdf_processor.preview_pdf(file.stream)
+        elif extension == '.xlsx':
+            preview = data_processor.preview_xlsx(file.stream, region)
+        else:
+            preview = data_processor.preview_csv(file.stream, region)
+    except upload_cache.InvalidUpload as e:
+        return jsonify({'error': str(e)}), 422
+    except Exception as e:
+        app.logger.warning("Preview of %s failed: %s", file.filename, e)
+        return jsonify({'error': f'File tidak bisa dibaca: {str(e)}'}), 422
+    
+    if extension != '.pdf':
+        preview['year'] = data_processor.extract_year_from_filename(file.filename)
+    return jsonify({'filename': file.filename, 'format': extension[1:], **preview})
+
 # ===== EXISTING ROUTES (NOW PROTECTED FOR ADMIN ONLY) =====
 @app.route('/upload', methods=['GET', 'POST'])
 @login_required
@@ -1290,8 +1224,9 @@ def upload():
             flash('Tahun harus diisi', 'error')
             return redirect(request.url)
         
-        if file.filename and not file.filename.lower().endswith('.csv'):
-            flash('File harus berformat CSV', 'error')
+        extension = os.path.splitext(file.filename or '')[1].lower()
+        if extension not in ('.csv', '.xlsx'):
+            flash('File harus berformat CSV atau XLSX', 'error')
             return redirect(request.url)
         
         if not validate_year(year):
@@ -1304,55 +1239,27 @@ def upload():
             flash('Tahun harus berupa angka', 'error')
             return redirect(request.url)
         
-        filename = f"tourism_{year}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(filepath)
-        
         try:
-            df = pd.read_csv(filepath)
-            palembang_found = False
-            for index, row in df.iterrows():
-                for cell in row:
-                    if 'Palembang' in str(cell):
-                        palembang_found = True
-                        break
-                if palembang_found:
-                    break
-            
-            if not palembang_found:
-                os.remove(filepath)
-                flash('Data Palembang tidak ditemukan dalam file', 'error')
-                return redirect(request.url)
-                
-        except Exception as e:
-            os.remove(filepath)
-            flash(f'File tidak bisa dibaca: {str(e)}', 'error')
+            if extension == '.xlsx':
+                sniff = data_processor.sniff_xlsx_header
+            else:
+                sniff = data_processor.sniff_csv_header
+            filepath, filename, sha256, _ = uploads.save_upload(
+                file.stream, f"tourism_{year}_", extension, sniff,
+                folder=app.config['UPLOAD_FOLDER'])
+        except uploads.UploadRejected as e:
+            flash(str(e), 'error')
             return redirect(request.url)
         
-        success, message = process_csv_file_simple(filepath, year)
-        
-        if success:
-            conn = get_db_connection()
-            conn.execute(
-                'INSERT INTO uploaded_files (filename, year) VALUES (?, ?)',
-                (filename, year)
-            )
-            conn.commit()
-            conn.close()
-            flash(f'File berhasil diupload: {message}', 'success')
-        else:
-            flash(f'Error: {message}', 'error')
-            if os.path.exists(filepath):
-                os.remove(filepath)
-        
-        return redirect(url_for('upload'))
+        return enqueue_upload(extension[1:], ingest_csv_job, filepath, year, filename, 'upload', sha256)
     
     db_stats = data_processor.get_database_stats()
     uploaded_files = data_processor.get_uploaded_files_info()
     
     return render_template('upload.html', 
                          db_stats=db_stats, 
-                         uploaded_files=uploaded_files)
+                         uploaded_files=uploaded_files,
+                         job_id=request.args.get('job'))
 
 @app.route('/upload-pdf', methods=['GET', 'POST'])
 @login_required
@@ -1384,35 +1291,15 @@ def upload_pdf():
             flash('Tahun harus berupa angka', 'error')
             return redirect(request.url)
         
-        filename = f"tourism_pdf_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(filepath)
-        
         try:
-            success, message = pdf_processor.process_pdf_for_database(filepath, year_int)
-            
-            if success:
-                conn = get_db_connection()
-                conn.execute(
-                    'INSERT INTO uploaded_files (filename, year) VALUES (?, ?)',
-                    (filename, year_int if year_int else datetime.now().year)
-                )
-                conn.commit()
-                conn.close()
-                
-                flash(f'PDF berhasil diproses: {message}', 'success')
-            else:
-                flash(f'Error processing PDF: {message}', 'error')
-            
-            if os.path.exists(filepath):
-                os.remove(filepath)
-                
-        except Exception as e:
-            flash(f'Error processing PDF: {str(e)}', 'error')
-            if os.path.exists(filepath):
-                os.remove(filepath)
+            filepath, filename, sha256, _ = uploads.save_upload(
+                file.stream, 'tourism_pdf_', '.pdf', pdf_processor.sniff_pdf_header,
+                folder=app.config['UPLOAD_FOLDER'])
+        except uploads.UploadRejected as e:
+            flash(str(e), 'error')
+            return redirect(request.url)
         
-        return redirect(url_for('upload_pdf'))
+        return enqueue_upload('pdf', ingest_pdf_job, filepath, year_int, filename, 'upload_pdf', sha256)
     
     db_stats = data_processor.get_database_stats()
     uploaded_files = data_processor.get_uploaded_files_info()
@@ -1421,7 +1308,8 @@ def upload_pdf():
     return render_template('upload_pdf.html', 
                          db_stats=db_stats, 
                          uploaded_files=uploaded_files,
-                         current_year=current_year)  # TAMBAHKAN INI
+                         current_year=current_year,  # TAMBAHKAN INI
+                         job_id=request.args.get('job'))
 
 @app.route('/convert-pdf-to-csv', methods=['POST'])
 def convert_pdf_to_csv():
@@ -1435,11 +1323,14 @@ def convert_pdf_to_csv():
     if not file.filename.lower().endswith('.pdf'):
         return jsonify({'success': False, 'message': 'File must be PDF'})
     
-    temp_pdf = os.path.join(app.config['UPLOAD_FOLDER'], f"temp_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf")
-    file.save(temp_pdf)
+    try:
+        temp_pdf = uploads.save_upload(file.stream, 'temp_', '.pdf', pdf_processor.sniff_pdf_header,
+                                       folder=app.config['UPLOAD_FOLDER'])[0]
+    except uploads.UploadRejected as e:
+        return jsonify({'success': False, 'message': str(e)})
+    output_csv = temp_pdf[:-len('.pdf')] + '.csv'
     
     try:
-        output_csv = temp_pdf.replace('.pdf', '.csv')
         success, message = pdf_processor.pdf_to_csv(temp_pdf, output_csv)
         
         if success:
@@ -1465,34 +1356,13 @@ def convert_pdf_to_csv():
 @login_required
 @role_required('admin')
 def dashboard():
-    conn = get_db_connection()
-    query = '''
-        SELECT year, month, value 
-        FROM tourism_data 
-        ORDER BY year, 
-        CASE month
-            WHEN 'January' THEN 1
-            WHEN 'February' THEN 2
-            WHEN 'March' THEN 3
-            WHEN 'April' THEN 4
-            WHEN 'May' THEN 5
-            WHEN 'June' THEN 6
-            WHEN 'July' THEN 7
-            WHEN 'August' THEN 8
-            WHEN 'September' THEN 9
-            WHEN 'October' THEN 10
-            WHEN 'November' THEN 11
-            WHEN 'December' THEN 12
-        END
-    '''
-    df = pd.read_sql_query(query, conn)
-    conn.close()
-    
-    analysis_results = analyze_data()
+    region = selected_region()
+    df = tourism_repository.get_series(app.config['DATABASE'], region)
     
     try:
-        ml_analysis = ml_analyzer.get_detailed_analysis()
+        ml_analysis = ml_analyzer.get_detailed_analysis(region)
         ml_analysis['suggestions'] = ml_analysis['suggestions'][:3]
+        analysis_results = analyze_data(ml_analysis, region)
     except Exception as e:
         ml_analysis = {
             'suggestions': ["ML Analysis sedang dalam perbaikan"],
@@ -1500,10 +1370,11 @@ def dashboard():
             'summary': {},
             'data_quality': {'total_years': 0, 'total_records': 0}
         }
+        analysis_results = analyze_data(region=region)
     
     charts_data_advanced = {}
     
-    db_stats = data_processor.get_database_stats()
+    db_stats = data_processor.get_database_stats(region)
     data_complexity = get_data_complexity_level()
     
     return render_template('dashboard.html',
@@ -1512,16 +1383,20 @@ def dashboard():
                          charts_data_advanced=charts_data_advanced,
                          db_stats=db_stats,
                          data_complexity=data_complexity,
-                         df_empty=df.empty)
+                         df_empty=df.empty,
+                         region=region,
+                         regions=tourism_repository.list_regions(app.config['DATABASE']))
 
 @app.route('/delete-data', methods=['POST'])
 def delete_data():
     try:
         conn = get_db_connection()
         conn.execute('DELETE FROM tourism_data')
+        tourism_repository.bump_data_version(conn)
         conn.execute('DELETE FROM uploaded_files')
+        conn.execute('DELETE FROM parsed_uploads')
         conn.commit()
-        conn.close()
+        tourism_repository.invalidate(app.config['DATABASE'])
         
         for filename in os.listdir(app.config['UPLOAD_FOLDER']):
             file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
@@ -1537,30 +1412,10 @@ def delete_data():
 @app.route('/export-excel')
 def export_excel():
     try:
-        conn = get_db_connection()
-        query = '''
-            SELECT year, month, value 
-            FROM tourism_data 
-            ORDER BY year, 
-            CASE month
-                WHEN 'January' THEN 1
-                WHEN 'February' THEN 2
-                WHEN 'March' THEN 3
-                WHEN 'April' THEN 4
-                WHEN 'May' THEN 5
-                WHEN 'June' THEN 6
-                WHEN 'July' THEN 7
-                WHEN 'August' THEN 8
-                WHEN 'September' THEN 9
-                WHEN 'October' THEN 10
-                WHEN 'November' THEN 11
-                WHEN 'December' THEN 12
-            END
-        '''
-        df = pd.read_sql_query(query, conn)
-        conn.close()
-        
-        ml_analysis = ml_analyzer.get_detailed_analysis()
+        region = selected_region()
+        df = tourism_repository.get_series(app.config['DATABASE'], region)
+        
+        ml_analysis = ml_analyzer.get_detailed_analysis(region)
         
         wb = openpyxl.Workbook()
         wb.remove(wb.active)
@@ -1581,12 +1436,13 @@ def export_excel():
         wb.save(excel_buffer)
         excel_buffer.seek(0)
         
-        filename = f"tourism_analysis_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
+        region_slug = secure_filename(region.lower())
+        filename = f"tourism_analysis_{region_slug}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
         
         return send_file(
             excel_buffer,
             as_attachment=True,
-            attachment_filename=filename,
+            download_name=filename,
             mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
         )
         
@@ -1596,15 +1452,12 @@ def export_excel():
 
 @app.route('/api/chart-data')
 def chart_data():
-    analysis_results = analyze_data()
+    analysis_results = analyze_data(region=selected_region())
     return jsonify(analysis_results['charts_data'])
 
 @app.route('/api/advanced-chart-data')
 def advanced_chart_data():
-    conn = get_db_connection()
-    query = 'SELECT year, month, value FROM tourism_data'
-    df = pd.read_sql_query(query, conn)
-    conn.close()
+    df = tourism_repository.get_series(app.config['DATABASE'], selected_region())
     
     try:
         charts_data = chart_generator.generate_all_charts_data(df)
@@ -1615,15 +1468,53 @@ def advanced_chart_data():
 @app.route('/api/analysis-data')
 def analysis_data():
     try:
-        analysis_results = ml_analyzer.get_detailed_analysis()
+        analysis_results = ml_analyzer.get_detailed_analysis(selected_region())
         analysis_results['suggestions'] = analysis_results['suggestions'][:3]
         return jsonify(analysis_results)
     except Exception as e:
         return jsonify({'error': str(e)})
 
+@app.route('/api/forecast')
+@login_required
+def forecast_api():
+    """
+    Monthly visitor forecast of ?region= for the next ?horizon= months
+    (default Config.FORECAST_HORIZON, at most Config.FORECAST_MAX_HORIZON).
+    ?model= is one of forecasting.MODELS or 'auto' (best backtest score),
+    ?level= the prediction interval in percent, and ?backtest=1 adds the
+    per-year scores of every model on held-out years.
+    """
+    try:
+        horizon = int(request.args.get('horizon', Config.FORECAST_HORIZON))
+        level = int(request.args.get('level', Config.FORECAST_LEVEL))
+    except ValueError:
+        return jsonify({'error': 'horizon dan level harus berupa angka'}), 400
+    horizon = max(1, min(horizon, Config.FORECAST_MAX_HORIZON))
+    
+    model = request.args.get('model', 'auto')
+    if model != 'auto' and model not in forecasting.MODELS:
+        return jsonify({'error': f"Model tidak dikenal. Pilihan: auto, {', '.join(forecasting.MODELS)}"}), 400
+    if level not in forecasting.Z_SCORES:
+        return jsonify({'error': f"level harus salah satu dari {sorted(forecasting.Z_SCORES)}"}), 400
+    
+    try:
+        result = forecaster.forecast(selected_region(), horizon, model, level,
+                                     include_backtest=request.args.get('backtest') in ('1', 'true', 'yes'))
+    except forecasting.ForecastUnavailable as e:
+        return jsonify({'error': str(e)}), 422
+    return jsonify(result)
+
+@app.route('/api/analysis-cache')
+@login_required
+@role_required('admin')
+def analysis_cache_stats():
+    """Hit/miss counters of this worker's analysis cache"""
+    return jsonify({'data_version': tourism_repository.data_version(app.config['DATABASE']),
+                    **analysis_results_cache.stats()})
+
 @app.route('/api/db-stats')
 def db_stats_api():
-    stats = data_processor.get_database_stats()
+    stats = data_processor.get_database_stats(request.args.get('region'))
     return jsonify(stats)
 
 @app.errorhandler(413)
@@ -1713,23 +1604,13 @@ def hotel_input():
             flash('Jumlah kamar terisi harus berupa angka', 'error')
             return redirect(url_for('hotel_input'))
         
-        # Check if date already exists
-        if HotelData.check_date_exists(app.config['DATABASE'], current_user.id, date):
-            flash(f'Data untuk tanggal {date} sudah ada. Silakan edit di dashboard.', 'warning')
-            return redirect(url_for('hotel_input'))
-        
         # Calculate guest count
         guest_count = calculate_guest_count(occupied_rooms)
         
-        # Save to database
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO hotel_data (user_id, date, occupied_rooms, guest_count)
-            VALUES (?, ?, ?, ?)
-        ''', (current_user.id, date, occupied_rooms, guest_count))
-        conn.commit()
-        conn.close()
+        # Save to database (skipped if the date already exists)
+        if not HotelData.add_daily_data(app.config['DATABASE'], current_user.id, date, occupied_rooms, guest_count):
+            flash(f'Data untuk tanggal {date} sudah ada. Silakan edit di dashboard.', 'warning')
+            return redirect(url_for('hotel_input'))
         
         flash(f'Data berhasil disimpan! Jumlah tamu: {guest_count} orang', 'success')
         return redirect(url_for('hotel_dashboard'))
@@ -1748,10 +1629,12 @@ def hotel_dashboard():
         return redirect(url_for('hotel_setup'))
     
     data = HotelData.get_all_data(app.config['DATABASE'], current_user.id)
+    monthly = HotelData.get_monthly_summary(app.config['DATABASE'], current_user.id)
     
     return render_template('hotel/dashboard.html', 
                          hotel_info=hotel_info,
-                         data=data)
+                         data=data,
+                         monthly=monthly)
 
 @app.route('/hotel/edit/<int:data_id>', methods=['POST'])
 @login_required
@@ -1788,7 +1671,6 @@ def hotel_edit(data_id):
             WHERE id = ? AND user_id = ?
         ''', (occupied_rooms, guest_count, data_id, current_user.id))
         conn.commit()
-        conn.close()
         
         flash('Data berhasil diupdate!', 'success')
     except ValueError:
@@ -1895,31 +1777,24 @@ def tourism_input():
             flash('Semua field angka harus berupa angka valid', 'error')
             return redirect(url_for('tourism_input'))
         
-        # Check if date already exists
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT id FROM tourism_site_data 
-            WHERE user_id = ? AND date = ?
-        ''', (current_user.id, date))
-        
-        if cursor.fetchone():
-            conn.close()
-            flash(f'Data untuk tanggal {date} sudah ada. Silakan edit di dashboard.', 'warning')
-            return redirect(url_for('tourism_input'))
-        
         # Calculate adults (subtract children)
         male_adult = male - male_child
         female_adult = female - female_child
         
-        # Save to database
+        # Save to database (skipped if the date already exists)
+        conn = get_db_connection()
+        cursor = conn.cursor()
         cursor.execute('''
             INSERT INTO tourism_site_data 
             (user_id, date, origin, total_visitors, male_adult, female_adult, male_child, female_child)
             VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(user_id, date) DO NOTHING
         ''', (current_user.id, date, origin, total_visitors, male_adult, female_adult, male_child, female_child))
         conn.commit()
-        conn.close()
+        
+        if cursor.rowcount == 0:
+            flash(f'Data untuk tanggal {date} sudah ada. Silakan edit di dashboard.', 'warning')
+            return redirect(url_for('tourism_input'))
         
         flash('Data berhasil disimpan!', 'success')
         return redirect(url_for('tourism_dashboard'))
@@ -1940,7 +1815,6 @@ def tourism_dashboard():
     ''', (current_user.id,))
     
     rows = cursor.fetchall()
-    conn.close()
     
     data = []
     for row in rows:
@@ -1956,7 +1830,9 @@ def tourism_dashboard():
             'created_at': row['created_at']
         })
     
-    return render_template('tourism/dashboard.html', data=data)
+    monthly = TourismData.get_monthly_summary(app.config['DATABASE'], current_user.id)
+    
+    return render_template('tourism/dashboard.html', data=data, monthly=monthly)
 
 @app.route('/tourism/edit/<int:data_id>', methods=['POST'])
 @login_required
@@ -1994,7 +1870,6 @@ def tourism_edit(data_id):
             WHERE id = ? AND user_id = ?
         ''', (origin, total_visitors, male_adult, female_adult, male_child, female_child, data_id, current_user.id))
         conn.commit()
-        conn.close()
         
         flash('Data berhasil diupdate!', 'success')
     except ValueError:
@@ -2016,7 +1891,6 @@ def tourism_export(format):
     ''', (current_user.id,))
     
     rows = cursor.fetchall()
-    conn.close()
     
     if not rows:
         flash('Tidak ada data untuk diexport', 'warning')
@@ -0,0 +1,191 @@
+"""
+Micro-benchmark of the count-cleaning and parsing paths used by ingestion.
+
+Compares the per-cell implementations the processors used before
+(``re.sub`` on uncompiled patterns, one cell or row at a time) with the
+vectorized ones now in utils.parse_counts / PDFProcessor.process_table /
+extract_year_from_pdf, and checks that both give the same results on
+well-formed BPS input.
+
+    python benchmarks/numeric_cleaning.py [cells]
+"""
+import os
+import random
+import re
+import sys
+import time
+from datetime import datetime
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pdf_processor import MONTH_MAPPING, PDFProcessor  # noqa: E402
+from utils import parse_counts  # noqa: E402
+
+BULAN = list(MONTH_MAPPING)
+
+
+# ===== BEFORE =====
+def legacy_clean_csv(value):
+    if pd.isna(value) or value == '':
+        return 0
+    if isinstance(value, (int, float)):
+        return int(value)
+    if isinstance(value, str):
+        cleaned = re.sub(r'[^\d]', '', str(value))
+        return int(cleaned) if cleaned else 0
+    return 0
+
+
+def legacy_clean_pdf(value):
+    if pd.isna(value) or value == '':
+        return 0
+    if isinstance(value, (int, float)):
+        return int(value)
+    if isinstance(value, str):
+        cleaned = re.sub(r'[^\d]', '', str(value).replace('.', ''))
+        return int(cleaned) if cleaned else 0
+    return 0
+
+
+def legacy_extract_year(text):
+    match = re.search(r'TAHUN\s+(\d{4})', text)
+    if match:
+        return int(match.group(1))
+    for pattern in [r'Tahun\s+(\d{4})', r'(\d{4})']:
+        matches = re.findall(pattern, text)
+        if matches:
+            return int(matches[0])
+    return datetime.now().year
+
+
+def legacy_process_table(table, year, page_text):
+    data_rows = []
+
+    header_found = False
+    nusantara_col = -1
+    manca_col = -1
+    total_col = -1
+    bulan_col = -1
+
+    for i, row in enumerate(table):
+        if not row or all(cell is None or cell == '' for cell in row):
+            continue
+
+        row_text = ' '.join([str(cell) for cell in row if cell])
+        if any(keyword in row_text.lower() for keyword in ['bulan', 'nusantara', 'manca', 'jumlah']):
+            header_found = True
+            for j, cell in enumerate(row):
+                if cell:
+                    cell_lower = str(cell).lower()
+                    if 'bulan' in cell_lower:
+                        bulan_col = j
+                    elif 'nusantara' in cell_lower:
+                        nusantara_col = j
+                    elif 'manca' in cell_lower:
+                        manca_col = j
+                    elif 'jumlah' in cell_lower and 'total' not in cell_lower:
+                        total_col = j
+            continue
+
+        if header_found and row[0] and any(str(cell).strip() for cell in row if cell):
+            bulan = None
+            nusantara = 0
+            manca = 0
+            total = 0
+
+            for j, cell in enumerate(row):
+                if cell and str(cell).strip():
+                    cell_lower = str(cell).strip().lower()
+                    if cell_lower in MONTH_MAPPING:
+                        bulan = MONTH_MAPPING[cell_lower]
+                        break
+
+            if not bulan:
+                continue
+
+            if nusantara_col != -1 and nusantara_col < len(row) and row[nusantara_col]:
+                nusantara = legacy_clean_pdf(row[nusantara_col])
+
+            if manca_col != -1 and manca_col < len(row) and row[manca_col]:
+                manca = legacy_clean_pdf(row[manca_col])
+
+            if total_col != -1 and total_col < len(row) and row[total_col]:
+                total = legacy_clean_pdf(row[total_col])
+            else:
+                total = nusantara + manca
+
+            data_rows.append({
+                'year': year,
+                'month': bulan,
+                'nusantara': nusantara,
+                'manca_negara': manca,
+                'total': total
+            })
+
+    return data_rows
+
+
+# ===== INPUT =====
+def make_cells(count):
+    rng = random.Random(0)
+    cells = []
+    for _ in range(count):
+        n = rng.randint(0, 5_000_000)
+        cells.append(rng.choice([f"{n:,}".replace(',', '.'), f"{n:,}", str(n), '-', '']))
+    return cells
+
+
+def make_table(year):
+    rng = random.Random(year)
+    table = [['Bulan', 'Wisatawan Nusantara', 'Wisatawan Mancanegara', 'Jumlah']]
+    for bulan in BULAN:
+        n, m = rng.randint(50_000, 900_000), rng.randint(0, 5_000)
+        table.append([bulan.capitalize(), f"{n:,}".replace(',', '.'), str(m), f"{n + m:,}".replace(',', '.')])
+    table.append(['Jumlah', '', '', ''])
+    return table
+
+
+def timed(label, func, repeat=3):
+    best = min(_time(func) for _ in range(repeat))
+    print(f"  {label:<28} {best * 1000:9.1f} ms")
+    return best
+
+
+def _time(func):
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    processor = PDFProcessor()
+
+    cells = make_cells(count)
+    print(f"Count cells ({count})")
+    before = timed('per-cell re.sub', lambda: [legacy_clean_csv(c) for c in cells])
+    after = timed('parse_counts (vectorized)', lambda: parse_counts(cells))
+    assert [legacy_clean_csv(c) for c in cells] == parse_counts(cells).tolist()
+    print(f"  speedup x{before / after:.1f}")
+
+    tables = [make_table(2000 + i % 25) for i in range(500)]
+    print(f"PDF tables ({len(tables)} x 12 months)")
+    before = timed('row-by-row process_table', lambda: [legacy_process_table(t, 2020, '') for t in tables])
+    after = timed('column-wise process_table', lambda: [processor.process_table(t, 2020, '') for t in tables])
+    assert [legacy_process_table(t, 2020, '') for t in tables] == [processor.process_table(t, 2020, '') for t in tables]
+    print(f"  speedup x{before / after:.1f}")
+
+    # No "Tahun <year>" label: the year is the first 4-digit number, ahead of thousands of counts
+    page = 'Periode 2019 ' + ' '.join(f"{BULAN[i % 12]} {1000 + i} {i}.{i:03d}" for i in range(3000))
+    pages = [page] * 200
+    print(f"Page years ({len(pages)} pages of {len(page)} chars)")
+    before = timed('re.findall per pattern', lambda: [legacy_extract_year(p) for p in pages])
+    after = timed('precompiled re.search', lambda: [processor.extract_year_from_pdf(p) for p in pages])
+    assert [legacy_extract_year(p) for p in pages] == [processor.extract_year_from_pdf(p) for p in pages]
+    print(f"  speedup x{before / after:.1f}")
+
+
+if __name__ == '__main__':
+    main()
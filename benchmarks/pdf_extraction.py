@@ -0,0 +1,81 @@
+"""
+Benchmark sequential vs. process-pool PDF page extraction.
+
+Builds a synthetic multi-page BPS-style PDF (a cover page, then one visitor
+table per page; every fourth table has no Jumlah column, so its text layer
+does not parse) and times PDFProcessor.extract_table_data with 1..N workers,
+checking that every run extracts the same records in the same order. The
+per-path page report is printed next to the cost of running pdfplumber table
+extraction on every page (the extractor before the text-layer fast path).
+
+    python benchmarks/pdf_extraction.py [pages] [max_workers]
+"""
+import os
+import sys
+import tempfile
+import time
+
+import pdfplumber
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.platypus import PageBreak, Paragraph, SimpleDocTemplate, Table, TableStyle
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pdf_processor import PDFProcessor  # noqa: E402
+
+BULAN = ['Januari', 'Februari', 'Maret', 'April', 'Mei', 'Juni',
+         'Juli', 'Agustus', 'September', 'Oktober', 'November', 'Desember']
+
+
+def build_pdf(path, pages):
+    styles = getSampleStyleSheet()
+    story = [Paragraph("STATISTIK KUNJUNGAN WISATAWAN KOTA PALEMBANG", styles['Title']),
+             Paragraph("Badan Pusat Statistik", styles['Normal']), PageBreak()]
+    for page in range(pages):
+        year = 2000 + page
+        with_total = page % 4 != 3
+        story.append(Paragraph(f"JUMLAH KUNJUNGAN WISATAWAN KOTA PALEMBANG TAHUN {year}", styles['Title']))
+        rows = [['Bulan', 'Wisatawan Nusantara', 'Wisatawan Mancanegara'] + (['Jumlah'] if with_total else [])]
+        for i, bulan in enumerate(BULAN):
+            nusantara, manca = 100000 + year + i * 1000, 500 + i
+            rows.append([bulan, f"{nusantara:,}".replace(',', '.'), str(manca)]
+                        + ([f"{nusantara + manca:,}".replace(',', '.')] if with_total else []))
+        table = Table(rows)
+        table.setStyle(TableStyle([('GRID', (0, 0), (-1, -1), 0.5, colors.black)]))
+        story += [table, PageBreak()]
+    SimpleDocTemplate(path, pagesize=A4).build(story)
+
+
+def main():
+    pages = int(sys.argv[1]) if len(sys.argv) > 1 else 24
+    max_workers = int(sys.argv[2]) if len(sys.argv) > 2 else max(2, os.cpu_count() or 1)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'synthetic.pdf')
+        build_pdf(path, pages)
+        processor = PDFProcessor()
+
+        start = time.perf_counter()
+        with pdfplumber.open(path) as pdf:
+            for page in pdf.pages:
+                page.extract_text()
+                page.extract_tables()
+        print(f"{pages + 1} pages, {os.cpu_count()} CPUs; tables on every page: {time.perf_counter() - start:.2f}s")
+        baseline = None
+        for workers in range(1, max_workers + 1):
+            start = time.perf_counter()
+            records = processor.extract_table_data(path, workers=workers)
+            elapsed = time.perf_counter() - start
+            baseline = baseline or (elapsed, records)
+            assert records == baseline[1], f"{workers} workers extracted different records"
+            print(f"  workers={workers}: {elapsed:.2f}s  {len(records)} records  "
+                  f"speedup x{baseline[0] / elapsed:.2f}")
+            print('    ' + ', '.join(f"{path}: {r['pages']} pages {r['seconds']:.2f}s"
+                                     for path, r in processor.last_report.items()))
+
+
+if __name__ == '__main__':
+    main()
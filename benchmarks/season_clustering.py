@@ -0,0 +1,135 @@
+"""
+Parity check and micro-benchmark of the season classifier's clustering.
+
+Runs the sklearn KMeans(n_init=10) + silhouette_score path that
+TourismAnalyzer.analyze_seasonal_distribution used before against the exact
+clustering.ckmeans / silhouette_1d on the regions in the database plus
+random 12-month profiles, and asserts that:
+
+- ckmeans' within-cluster sum of squares is never worse than KMeans'
+- whenever both reach the same optimum, the Low/Medium/High labels match
+  and the silhouette scores agree
+
+Profiles where KMeans stopped in a worse local optimum are counted and
+listed rather than failed: those are the cases the exact method fixes.
+scikit-learn is only needed for this script, not by the app.
+
+    python benchmarks/season_clustering.py [random_profiles] [database]
+"""
+import os
+import sqlite3
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from clustering import ckmeans, silhouette_1d  # noqa: E402
+
+try:
+    from sklearn.cluster import KMeans
+    from sklearn.metrics import silhouette_score
+except ImportError:
+    sys.exit("scikit-learn is required as the reference implementation: pip install scikit-learn")
+
+SEASONS = {2: ('Low', 'High'), 3: ('Low', 'Medium', 'High')}
+
+
+# ===== BEFORE =====
+def legacy_seasons(monthly):
+    X = monthly.reshape(-1, 1)
+    n_clusters = min(3, len(np.unique(X)))
+    kmeans = KMeans(n_clusters=n_clusters, random_state=42, n_init=10)
+    labels = kmeans.fit_predict(X)
+    rank = np.argsort(np.argsort(kmeans.cluster_centers_.ravel()))
+    return [SEASONS[n_clusters][rank[label]] for label in labels], silhouette_score(X, labels), labels
+
+
+# ===== AFTER =====
+def exact_seasons(monthly):
+    n_clusters = min(3, len(np.unique(monthly)))
+    labels, _ = ckmeans(monthly, n_clusters)
+    return [SEASONS[n_clusters][label] for label in labels], silhouette_1d(monthly, labels), labels
+
+
+def within_ss(monthly, labels):
+    return sum(((monthly[labels == c] - monthly[labels == c].mean()) ** 2).sum() for c in np.unique(labels))
+
+
+def database_profiles(db_path):
+    """Mean per month of every region x year series in tourism_data"""
+    if not os.path.exists(db_path):
+        return {}
+    conn = sqlite3.connect(db_path)
+    try:
+        rows = conn.execute('''
+            SELECT region, month_num, AVG(value) FROM tourism_data
+            WHERE month_num IS NOT NULL GROUP BY region, month_num
+        ''').fetchall()
+    except sqlite3.OperationalError as e:
+        print(f"Skipping {db_path} ({e}); run `flask --app app db-upgrade` first")
+        return {}
+    finally:
+        conn.close()
+    profiles = {}
+    for region, month_num, value in rows:
+        profiles.setdefault(region, np.zeros(12))[int(month_num) - 1] = value
+    return profiles
+
+
+def random_profiles(count, seed=7):
+    """Seasonal curves, flat-ish series, spiky series and series with repeated values"""
+    rng = np.random.default_rng(seed)
+    months = np.arange(12)
+    for i in range(count):
+        kind = i % 4
+        if kind == 0:
+            base = rng.uniform(1e4, 5e5)
+            yield f"seasonal-{i}", base * (1 + rng.uniform(0.1, 0.6) * np.sin((months + rng.integers(12)) / 12 * 2 * np.pi)) + rng.normal(0, base * 0.05, 12)
+        elif kind == 1:
+            yield f"flat-{i}", rng.normal(1e5, 1e3, 12)
+        elif kind == 2:
+            profile = rng.uniform(1e3, 1e4, 12)
+            profile[rng.choice(12, rng.integers(1, 4), replace=False)] *= rng.uniform(5, 20)
+            yield f"spiky-{i}", profile
+        else:
+            yield f"repeated-{i}", rng.choice(rng.uniform(1e3, 1e5, 4), 12).round()
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    db_path = sys.argv[2] if len(sys.argv) > 2 else 'tourism.db'
+    profiles = list(database_profiles(db_path).items()) + list(random_profiles(count))
+    profiles = [(name, np.maximum(np.asarray(p, dtype=float), 0)) for name, p in profiles]
+    profiles = [(name, p) for name, p in profiles if len(np.unique(p)) >= 2]
+
+    matched, local_optima = 0, []
+    for name, monthly in profiles:
+        old_seasons, old_silhouette, old_labels = legacy_seasons(monthly)
+        new_seasons, new_silhouette, new_labels = exact_seasons(monthly)
+        old_ss, new_ss = within_ss(monthly, old_labels), within_ss(monthly, new_labels)
+        tolerance = 1e-9 * max(old_ss, 1.0)
+        assert new_ss <= old_ss + tolerance, f"{name}: ckmeans SS {new_ss} > KMeans SS {old_ss}"
+        if new_ss < old_ss - tolerance:
+            local_optima.append((name, old_ss, new_ss))
+            continue
+        assert old_seasons == new_seasons, f"{name}: {old_seasons} != {new_seasons}"
+        assert abs(old_silhouette - new_silhouette) < 1e-9, f"{name}: silhouette {old_silhouette} != {new_silhouette}"
+        matched += 1
+
+    print(f"{len(profiles)} profiles: {matched} identical labels and silhouette, "
+          f"{len(local_optima)} where KMeans(n_init=10) missed the optimum")
+    for name, old_ss, new_ss in local_optima[:10]:
+        print(f"  {name}: KMeans SS {old_ss:.4g}, exact SS {new_ss:.4g}")
+
+    sample = profiles[0][1]
+    for label, func, repeat in (('before (sklearn)', legacy_seasons, 20), ('after (exact)', exact_seasons, 2000)):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            func(sample)
+        print(f"{label:<17} {(time.perf_counter() - started) / repeat * 1e6:10.1f} us per classification")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+"""
+Bulk import of a directory tree of BPS CSV/PDF files (``flask import-dir``).
+
+Files are hashed and parsed in a process pool and written by the calling
+process, ``Config.IMPORT_BATCH_SIZE`` files per transaction with a savepoint
+per file, so a file that cannot be written is rolled back and reported on its
+own. Each file is recorded in uploaded_files (with its SHA-256) together with
+its rows, so a rerun after a crash skips everything already imported and
+resumes with the rest.
+"""
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import upload_cache
+from config import Config
+from data_processor import DataProcessor
+from database import get_connection
+from pdf_processor import PDFProcessor
+from tourism_repository import bump_data_version, invalidate, merge_rows
+
+EXTENSIONS = ('.csv', '.xlsx', '.pdf')
+
+
+def find_files(directory):
+    """CSV/XLSX/PDF files under ``directory``, in path order"""
+    paths = []
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        paths += [os.path.join(root, name) for name in sorted(files) if name.lower().endswith(EXTENSIONS)]
+    return paths
+
+
+def parse_file(path):
+    """
+    Rows of one file in parsed_uploads form (CSV/XLSX rows have year None); runs
+    in a pool worker. Returns (rows, error).
+    """
+    try:
+        if path.lower().endswith('.csv'):
+            processor = DataProcessor()
+            valid, message, parsed = processor.validate_csv_structure(path)
+            if not valid:
+                return None, message
+            regions = processor.extract_regions(parsed)
+            return list(zip(regions['region'].tolist(), [None] * len(regions),
+                            regions['month'].tolist(), regions['value'].tolist())), None
+        if path.lower().endswith('.xlsx'):
+            return DataProcessor().parse_xlsx(path), None
+
+        # One worker per file already; no nested page pool
+        data = PDFProcessor().extract_table_data(path, workers=1)
+        if not data:
+            return None, "Tidak ada data yang berhasil diekstrak dari PDF"
+        return [(Config.DEFAULT_REGION, record['year'], record['month'], int(record['total']))
+                for record in data], None
+    except Exception as e:
+        return None, str(e)
+
+
+def file_year(path, rows):
+    """Year from the filename, else (PDFs only) the year printed on the first page read"""
+    year = DataProcessor().extract_year_from_filename(os.path.basename(path))
+    if year is None and path.lower().endswith('.pdf') and rows and rows[0][1] is not None:
+        year = rows[0][1]
+    return year
+
+
+def import_directory(directory, db_path=None, workers=None, batch_size=None, echo=print):
+    """
+    Import every new CSV/XLSX/PDF under ``directory``. Returns a report dict:
+    files, imported, skipped, failed [(path, error)], rows, changed, seconds.
+    """
+    db_path = db_path or Config.DATABASE
+    batch_size = batch_size or Config.IMPORT_BATCH_SIZE
+    conn = get_connection(db_path)
+    started = time.perf_counter()
+
+    paths = find_files(directory)
+    report = {'files': len(paths), 'imported': 0, 'skipped': 0, 'failed': [], 'rows': 0, 'changed': 0}
+    batch = []
+
+    def flush():
+        # One transaction per batch, one savepoint per file: a file that fails
+        # is rolled back and reported alone, the rest of its batch is kept.
+        imported, rows, changed = 0, 0, 0
+        try:
+            if not conn.in_transaction:
+                conn.execute('BEGIN')
+            for item in batch:
+                conn.execute('SAVEPOINT import_file')
+                try:
+                    if not item['cached']:
+                        upload_cache.store_rows(conn, item['sha256'], item['parsed'], commit=False)
+                    count, file_changed = merge_rows(conn, item['rows'], [
+                        (os.path.basename(item['path']), item['year'], item['sha256'])])
+                except Exception as e:
+                    conn.execute('ROLLBACK TO import_file')
+                    report['failed'].append((item['path'], str(e)))
+                else:
+                    imported += 1
+                    rows += count
+                    changed += file_changed
+                conn.execute('RELEASE import_file')
+            if changed:
+                bump_data_version(conn)
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            report['failed'] += [(item['path'], f"Batch gagal: {e}") for item in batch]
+        else:
+            report['imported'] += imported
+            report['rows'] += rows
+            report['changed'] += changed
+            echo(f"  {report['imported']} file diimpor ({report['rows']} baris, {report['changed']} berubah)")
+        finally:
+            invalidate(db_path)
+        batch.clear()
+
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        hashes = list(pool.map(upload_cache.file_sha256, paths, chunksize=8))
+
+        done = upload_cache.imported_hashes(conn)
+        parsed_before = upload_cache.parsed_hashes(conn)
+        pending = []
+        for path, sha256 in zip(paths, hashes):
+            if sha256 in done:
+                report['skipped'] += 1  # imported by an earlier run, or a duplicate file
+            else:
+                done.add(sha256)
+                pending.append((path, sha256, sha256 in parsed_before))
+
+        # Parse results are taken in pending order as the workers finish them
+        # and written batch by batch: rows are dropped once written, and an
+        # interrupted run keeps every batch flushed so far.
+        parsed_files = pool.map(parse_file, [path for path, _, cached in pending if not cached])
+
+        for path, sha256, cached in pending:
+            parsed, error = (upload_cache.cached_rows(conn, sha256), None) if cached else next(parsed_files)
+            year = file_year(path, parsed) if error is None else None
+            if error is None and year is None:
+                error = "Tahun tidak dapat ditentukan dari nama file"
+            if error:
+                report['failed'].append((path, error))
+                continue
+
+            batch.append({'path': path, 'sha256': sha256, 'year': year, 'parsed': parsed, 'cached': cached,
+                          'rows': upload_cache.with_year(parsed, None if path.lower().endswith('.pdf') else year)})
+            if len(batch) >= batch_size:
+                flush()
+        if batch:
+            flush()
+
+    report['seconds'] = time.perf_counter() - started
+    return report
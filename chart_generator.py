@@ -187,7 +187,7 @@ class ChartGenerator:
 
         if self.ml_analyzer:
             try:
-                seasonal_data = self.ml_analyzer.get_seasonal_analysis_for_charts()
+                seasonal_data = self.ml_analyzer.get_seasonal_analysis_for_charts(df=df)
                 season_percentages = seasonal_data['season_percentages']
 
                 labels = []
@@ -410,7 +410,7 @@ class ChartGenerator:
         
         if self.ml_analyzer:
             try:
-                seasonal_data = self.ml_analyzer.get_seasonal_analysis_for_charts()
+                seasonal_data = self.ml_analyzer.get_seasonal_analysis_for_charts(df=df)
                 return seasonal_data
             except Exception as e:
                 print(f"Error using ML analyzer for seasonal data: {e}")
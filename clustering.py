@@ -0,0 +1,101 @@
+"""
+Exact k-means and silhouette for one-dimensional data.
+
+The season classifier clusters only 12 monthly averages, so instead of
+iterative (and seed-dependent) k-means the optimal partition is found
+directly: in 1-D every optimal cluster is a contiguous run of the sorted
+values, and dynamic programming over the prefix sums picks the breaks with
+the smallest total within-cluster sum of squares (the Ckmeans.1d.dp
+approach). The silhouette is computed from per-cluster prefix sums instead
+of a pairwise distance matrix. Both are deterministic; ties go to the
+earliest break.
+"""
+import numpy as np
+
+
+def ckmeans(values, k):
+    """
+    Globally optimal 1-D k-means of ``values`` into ``k`` clusters.
+    Returns (labels, centroids): labels follow the input order, cluster 0
+    has the smallest centroid and centroids are ascending. ``k`` must not
+    exceed the number of distinct values (more clusters could only split
+    equal values between clusters with the same centroid).
+    """
+    values = np.asarray(values, dtype=float).ravel()
+    n = len(values)
+    distinct = len(np.unique(values))
+    if not 1 <= k <= distinct:
+        raise ValueError(f"k must be between 1 and the {distinct} distinct values, got {k}")
+
+    order = np.argsort(values, kind='stable')
+    x = values[order] - values.mean()  # centred for numerically stable sums of squares
+    s1 = np.concatenate(([0.0], np.cumsum(x)))
+    s2 = np.concatenate(([0.0], np.cumsum(x * x)))
+
+    # cost[j, i]: sum of squared deviations of x[j..i] (inf for j > i)
+    start = np.arange(n)[:, None]
+    end = np.arange(n)[None, :]
+    size = end - start + 1
+    with np.errstate(divide='ignore', invalid='ignore'):
+        segment_sum = s1[end + 1] - s1[start]
+        cost = np.where(size > 0, s2[end + 1] - s2[start] - segment_sum ** 2 / size, np.inf)
+    cost = np.maximum(cost, 0.0)
+
+    # best[c, i]: minimal cost of x[0..i] in c + 1 clusters; first[c, i]: start of the last one
+    best = np.empty((k, n))
+    first = np.zeros((k, n), dtype=int)
+    best[0] = cost[0]
+    for c in range(1, k):
+        candidates = np.full((n, n), np.inf)
+        candidates[1:] = best[c - 1, :-1, None] + cost[1:]
+        first[c] = np.argmin(candidates, axis=0)
+        best[c] = candidates[first[c], np.arange(n)]
+
+    sorted_labels = np.empty(n, dtype=int)
+    end_index = n - 1
+    for c in range(k - 1, 0, -1):
+        start_index = first[c, end_index]
+        sorted_labels[start_index:end_index + 1] = c
+        end_index = start_index - 1
+    sorted_labels[:end_index + 1] = 0
+
+    labels = np.empty(n, dtype=int)
+    labels[order] = sorted_labels
+    centroids = np.bincount(labels, weights=values, minlength=k) / np.bincount(labels, minlength=k)
+    return labels, centroids
+
+
+def silhouette_1d(values, labels):
+    """
+    Mean silhouette coefficient of a 1-D clustering (same definition as
+    sklearn's silhouette_score; points alone in their cluster score 0).
+    Distance sums to every cluster come from its sorted prefix sums.
+    """
+    values = np.asarray(values, dtype=float).ravel()
+    labels = np.asarray(labels).ravel()
+    clusters = np.unique(labels)
+    if not 2 <= len(clusters) <= len(values) - 1:
+        raise ValueError("silhouette needs between 2 and n - 1 clusters")
+
+    # distance_sum[i, c]: sum of |values[i] - y| over the members y of cluster c
+    distance_sum = np.empty((len(values), len(clusters)))
+    sizes = np.empty(len(clusters))
+    for column, cluster in enumerate(clusters):
+        members = np.sort(values[labels == cluster])
+        prefix = np.concatenate(([0.0], np.cumsum(members)))
+        below = np.searchsorted(members, values, side='right')
+        distance_sum[:, column] = (values * below - prefix[below]
+                                   + (prefix[-1] - prefix[below]) - values * (len(members) - below))
+        sizes[column] = len(members)
+
+    own = np.searchsorted(clusters, labels)
+    rows = np.arange(len(values))
+    own_size = sizes[own]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        a = distance_sum[rows, own] / (own_size - 1)
+        other = distance_sum / sizes
+        other[rows, own] = np.inf
+        b = other.min(axis=1)
+        scores = (b - a) / np.maximum(a, b)
+    scores[(own_size == 1) | ~np.isfinite(scores)] = 0.0
+    return float(scores.mean())
@@ -5,6 +5,53 @@ class Config:
     UPLOAD_FOLDER = 'uploads'
     DATABASE = 'tourism.db'
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
+    UPLOAD_SPOOL_SIZE = int(os.environ.get('UPLOAD_SPOOL_SIZE', 1024 * 1024))  # upload parts above this go to a temp file
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))  # idle SQLite connections kept per database
+    
+    # SQLite PRAGMAs applied to every connection (WAL lets readers and writers run concurrently)
+    SQLITE_PRAGMAS = {
+        'journal_mode': os.environ.get('SQLITE_JOURNAL_MODE', 'WAL'),
+        'synchronous': os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+        'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000)),  # ms to wait on a locked database
+        'cache_size': int(os.environ.get('SQLITE_CACHE_SIZE', -20000)),  # negative = KiB, ~20MB page cache
+        'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', 128 * 1024 * 1024)),
+        'temp_store': os.environ.get('SQLITE_TEMP_STORE', 'MEMORY'),
+    }
+    MIGRATION_BATCH_SIZE = 5000  # rows per commit for backfills/table rebuilds
+    
+    # Aggregations run on DuckDB (if installed) over the SQLite file; 'sqlite' forces the fallback
+    ANALYTICS_BACKEND = os.environ.get('ANALYTICS_BACKEND', 'auto')
+    
+    # Admin data views (keyset pagination)
+    ADMIN_PAGE_SIZE = int(os.environ.get('ADMIN_PAGE_SIZE', 50))
+    ADMIN_MAX_PAGE_SIZE = 500
+    
+    # Background ingestion (uploads are processed by a worker pool, see jobs.py)
+    JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))
+    JOB_QUEUE_SIZE = int(os.environ.get('JOB_QUEUE_SIZE', 20))  # queued + running jobs before uploads are refused
+    IMPORT_BATCH_SIZE = int(os.environ.get('IMPORT_BATCH_SIZE', 20))  # files per transaction in `flask import-dir`
+    
+    # PDF table extraction runs one page per worker process; a page slower than the timeout is skipped
+    PDF_WORKERS = int(os.environ.get('PDF_WORKERS', min(4, os.cpu_count() or 1)))
+    PDF_PAGE_TIMEOUT = int(os.environ.get('PDF_PAGE_TIMEOUT', 60))  # seconds
+    
+    # Upload preview (/api/upload-preview) parses only the head of a file
+    PREVIEW_ROWS = int(os.environ.get('PREVIEW_ROWS', 50))  # CSV/XLSX rows
+    PREVIEW_PDF_PAGES = int(os.environ.get('PREVIEW_PDF_PAGES', 3))  # pages searched for the first month table
+    
+    # get_detailed_analysis() results, reused until tourism_data changes (see analysis_cache.py).
+    # Set ANALYSIS_CACHE_DIR to share them between worker processes.
+    ANALYSIS_CACHE_SIZE = int(os.environ.get('ANALYSIS_CACHE_SIZE', 32))  # entries kept in memory per process
+    ANALYSIS_CACHE_DIR = os.environ.get('ANALYSIS_CACHE_DIR') or None
+    
+    # Visitor forecasts (/api/forecast, see forecasting.py)
+    FORECAST_HORIZON = 12  # months, when ?horizon= is not given
+    FORECAST_MAX_HORIZON = 24
+    FORECAST_LEVEL = 95  # prediction interval (%): 80, 90, 95 or 99
+    FORECAST_BACKTEST_YEARS = int(os.environ.get('FORECAST_BACKTEST_YEARS', 3))  # held-out years scored per model
+    
+    # Region shown when none is selected (tourism_data holds every regency/city of a BPS file)
+    DEFAULT_REGION = 'Palembang'
     
     # ML Settings
     DEFAULT_CLUSTERS = 3
@@ -1,156 +1,379 @@
+import csv
+from contextlib import closing
+
+import openpyxl
 import pandas as pd
 import numpy as np
-import sqlite3
 import os
 from datetime import datetime
 import re
 
+from config import Config
+from database import get_connection
+import upload_cache
+from tourism_repository import MONTHS, get_series, normalize_region
+from utils import parse_count, parse_counts
+
+HEADER_ROWS = 3  # BPS exports put up to three header rows above the data
+XLSX_CHUNK_ROWS = 2000  # worksheet rows turned into one DataFrame while streaming a workbook
+
+
+def xlsx_cell_text(value):
+    """
+    Text of a worksheet cell as a CSV would hold it. Numbers are truncated
+    to their integer part first (parse_count()'s rule), so the non-digit
+    stripping of parse_counts() cannot turn 1500.5 into 15005.
+    """
+    if value is None:
+        return ''
+    if isinstance(value, (int, float)) and not isinstance(value, bool) and np.isfinite(value):
+        return str(int(value))
+    return str(value)
+
+# Month names as they appear in BPS headers (Indonesian, English, abbreviated)
+MONTH_ALIASES = {
+    'januari': 'January', 'january': 'January', 'jan': 'January',
+    'februari': 'February', 'pebruari': 'February', 'february': 'February', 'feb': 'February', 'peb': 'February',
+    'maret': 'March', 'march': 'March', 'mar': 'March',
+    'april': 'April', 'apr': 'April',
+    'mei': 'May', 'may': 'May',
+    'juni': 'June', 'june': 'June', 'jun': 'June',
+    'juli': 'July', 'july': 'July', 'jul': 'July',
+    'agustus': 'August', 'august': 'August', 'agu': 'August', 'ags': 'August', 'aug': 'August',
+    'september': 'September', 'sept': 'September', 'sep': 'September',
+    'oktober': 'October', 'october': 'October', 'okt': 'October', 'oct': 'October',
+    'nopember': 'November', 'november': 'November', 'nop': 'November', 'nov': 'November',
+    'desember': 'December', 'december': 'December', 'des': 'December', 'dec': 'December',
+}
+MONTH_PATTERN = re.compile(r'\b(' + '|'.join(sorted(MONTH_ALIASES, key=len, reverse=True)) + r')\b')
+# A count cell: digits with thousands separators, or '-' for none
+COUNT_CELL_PATTERN = re.compile(r'^\s*(-|\d[\d.,\s]*)\s*$')
+# Province/grand total rows are not regions
+TOTAL_ROW_PATTERN = re.compile(r'^\s*(jumlah|total)\b', re.IGNORECASE)
+# Year in an upload filename: our own 'tourism_<year>_...' names first, then any 20xx
+# (not \b: '_' is a word character, so 'bps_2019.csv' has no word boundary before the year)
+FILENAME_YEAR_PATTERNS = (re.compile(r'tourism_(\d{4})_'), re.compile(r'(?<!\d)(20\d{2})(?!\d)'))
+
 class DataProcessor:
     def __init__(self, db_path='tourism.db'):
         self.db_path = db_path
     
+    def sniff_csv_header(self, head):
+        """
+        Cheap check of the first bytes of an upload before it is stored: text,
+        comma-separated, and some line wide enough for a name plus 10 month
+        columns (the minimum validate_csv_structure accepts). Returns (valid, message).
+        """
+        if b'\x00' in head:
+            return False, "File bukan CSV teks"
+        
+        lines = head.decode('utf-8-sig', errors='replace').splitlines()
+        if len(lines) > 1 and len(head) >= 1024:
+            lines = lines[:-1]  # possibly cut off mid-row
+        if not lines:
+            return False, "File CSV kosong"
+        
+        if max(len(row) for row in csv.reader(lines)) >= 11:
+            return True, "OK"
+        for delimiter, name in ((';', 'titik koma'), ('\t', 'tab')):
+            if max(line.count(delimiter) for line in lines) >= 10:
+                return False, f"Pemisah kolom harus koma, file ini memakai {name}"
+        return False, "Tidak ditemukan kolom bulan (minimal 10 kolom bulan per baris)"
+    
+    def read_csv(self, filepath, nrows=None):
+        """Parse a BPS CSV once, every cell as text (header rows included)"""
+        return pd.read_csv(filepath, header=None, dtype=str, keep_default_na=False, nrows=nrows)
+    
+    def find_data_rows(self, df):
+        """(count-cell mask, positions of rows where at least half the cells are counts)"""
+        is_count = df.apply(lambda column: column.str.match(COUNT_CELL_PATTERN)).to_numpy()
+        return is_count, np.flatnonzero(is_count.sum(axis=1) * 2 >= df.shape[1])
+    
+    def select_region_rows(self, df, data_rows, name_column):
+        """Data rows that name a region (blank names and Jumlah/Total rows dropped)"""
+        names = df.iloc[data_rows, name_column].str.strip()
+        return data_rows[((names != '') & ~names.str.match(TOTAL_ROW_PATTERN)).to_numpy()]
+    
+    def resolve_month_columns(self, df, first_data_row, name_column):
+        """
+        map_month_columns() with the fallback for header-less files (name then
+        Jan-Dec). Returns (month_columns, error_message).
+        """
+        month_columns = self.map_month_columns(df, first_data_row, name_column)
+        if not month_columns:
+            # No month headers: the simple BPS layout, region name then Jan-Dec
+            if df.shape[1] < name_column + 13:
+                return None, "Kolom bulan tidak terdeteksi. Pastikan ada kolom Jan-Des"
+            month_columns = {month: name_column + i + 1 for i, month in enumerate(MONTHS)}
+        elif len(month_columns) < 10:
+            return None, f"Hanya {len(month_columns)} bulan yang terdeteksi. Pastikan ada kolom Jan-Des"
+        return month_columns, None
+    
+    def locate_table(self, df):
+        """
+        Find the region rows and the region-name column of a parsed CSV.
+        Data rows are rows where at least half the cells are counts; the
+        name column is the first column that is mostly not counts there.
+        Returns (data_row_positions, name_column) or (None, None).
+        """
+        is_count, data_rows = self.find_data_rows(df)
+        if not len(data_rows):
+            return None, None
+        
+        text_columns = np.flatnonzero(is_count[data_rows].mean(axis=0) < 0.5)
+        if not len(text_columns):
+            return None, None
+        return data_rows, int(text_columns[0])
+    
+    def map_month_columns(self, df, first_data_row, name_column):
+        """
+        {month: column position} from the header rows above the first data
+        row. Each column is matched once against MONTH_PATTERN; the first
+        column naming a month wins.
+        """
+        header = df.iloc[max(0, first_data_row - HEADER_ROWS):first_data_row]
+        month_columns = {}
+        for position in range(df.shape[1]):
+            if position == name_column:
+                continue  # a title such as 'Januari-Desember' is not a month column
+            match = MONTH_PATTERN.search(' '.join(header.iloc[:, position]).lower())
+            if match:
+                month_columns.setdefault(MONTH_ALIASES[match.group(1)], position)
+        return month_columns
+    
     def validate_csv_structure(self, filepath):
+        """
+        Parse and validate a CSV upload. Returns (valid, message, parsed);
+        ``parsed`` is handed to extract_regions so the file is read once.
+        """
         try:
-            df = None
-            
-            try:
-                df = pd.read_csv(filepath, header=[0,1,2])
-            except:
-                try:
-                    df = pd.read_csv(filepath)
-                except Exception as e:
-                    return False, f"Tidak bisa membaca file CSV: {str(e)}"
-            
-            if df is None or df.empty:
-                return False, "File CSV kosong atau tidak bisa dibaca"
-            
-            expected_months = ['January', 'February', 'March', 'April', 'May', 'June',
-                             'July', 'August', 'September', 'October', 'November', 'December']
-            
-            palembang_found = False
-            for index, row in df.iterrows():
-                first_col_value = str(row.iloc[0]) if len(row) > 0 else ""
-                if 'Palembang' in first_col_value:
-                    palembang_found = True
-                    break
-            
-            if not palembang_found:
-                return False, "Data untuk Palembang tidak ditemukan dalam file CSV"
-            
-            month_columns_found = 0
-            for col in df.columns:
-                col_str = str(col).lower()
-                for month in expected_months:
-                    if month.lower() in col_str:
-                        month_columns_found += 1
-                        break
-            
-            if month_columns_found >= 10:
-                return True, "Struktur CSV valid"
-            else:
-                return False, f"Hanya {month_columns_found} bulan yang terdeteksi. Pastikan ada kolom Jan-Des"
-            
+            df = self.read_csv(filepath)
         except Exception as e:
-            return False, f"Error validasi CSV: {str(e)}"
+            return False, f"Tidak bisa membaca file CSV: {str(e)}", None
+        
+        if df.empty:
+            return False, "File CSV kosong atau tidak bisa dibaca", None
+        
+        data_rows, name_column = self.locate_table(df)
+        if data_rows is None:
+            return False, "Tidak ada baris data wilayah dalam file CSV", None
+        
+        region_rows = self.select_region_rows(df, data_rows, name_column)
+        if not len(region_rows):
+            return False, "Tidak ada baris data wilayah dalam file CSV", None
+        
+        month_columns, error = self.resolve_month_columns(df, int(data_rows[0]), name_column)
+        if error:
+            return False, error, None
+        
+        parsed = {
+            'df': df,
+            'region_rows': region_rows,
+            'name_column': name_column,
+            'month_columns': month_columns
+        }
+        return True, "Struktur CSV valid", parsed
+    
+    def extract_regions(self, parsed):
+        """
+        Every region row x 12 months of a validated CSV as a long DataFrame
+        with region, month, value columns. Months missing from the file are 0.
+        """
+        df = parsed['df']
+        block = pd.DataFrame(index=range(len(parsed['region_rows'])))
+        for month in MONTHS:
+            position = parsed['month_columns'].get(month)
+            if position is None:
+                block[month] = 0
+                continue
+            block[month] = parse_counts(df.iloc[parsed['region_rows'], position])
+        
+        block.insert(0, 'region', df.iloc[parsed['region_rows'], parsed['name_column']].map(normalize_region).to_numpy())
+        return block.melt(id_vars='region', var_name='month', value_name='value')
     
     def extract_year_from_filename(self, filename):
-        try:
-            match = re.search(r'tourism_(\d{4})_', filename)
+        for pattern in FILENAME_YEAR_PATTERNS:
+            match = pattern.search(filename)
             if match:
                 return int(match.group(1))
-            
-            matches = re.findall(r'\b(20\d{2})\b', filename)
-            if matches:
-                return int(matches[0])
-                
-            return None
-        except:
-            return None
+        return None
     
     def clean_numeric_value(self, value):
-        if pd.isna(value) or value == '':
-            return 0
+        return parse_count(value)
+    
+    def sniff_xlsx_header(self, head):
+        """An .xlsx workbook is a ZIP archive"""
+        if not head.startswith(b'PK\x03\x04'):
+            return False, "File bukan workbook XLSX yang valid"
+        return True, "OK"
+    
+    def iter_xlsx_chunks(self, filepath, chunk_rows=XLSX_CHUNK_ROWS):
+        """
+        (sheet title, DataFrame of up to ``chunk_rows`` rows, every cell as
+        text) for each worksheet, streamed with openpyxl in read-only mode so
+        only one chunk of one sheet is in memory at a time.
+        """
+        workbook = openpyxl.load_workbook(filepath, read_only=True, data_only=True)
+        try:
+            for sheet in workbook.worksheets:
+                rows = []
+                for values in sheet.iter_rows(values_only=True):
+                    rows.append([xlsx_cell_text(value) for value in values])
+                    if len(rows) == chunk_rows:
+                        yield sheet.title, pd.DataFrame(rows).fillna('')
+                        rows = []
+                if rows:
+                    yield sheet.title, pd.DataFrame(rows).fillna('')
+        finally:
+            workbook.close()
+    
+    def iter_xlsx_regions(self, filepath):
+        """
+        Long (region, month, value) frames of every worksheet with a BPS table.
+        Each sheet's layout (name column, month columns) is found like a CSV's,
+        from its header rows and first data row; later chunks of the sheet
+        reuse it. Sheets without a table are skipped.
+        """
+        sheet, layout, above = None, None, None
+        for title, chunk in self.iter_xlsx_chunks(filepath):
+            if title != sheet:
+                sheet, layout, above = title, None, None
+            
+            if layout is None:
+                if above is not None:
+                    chunk = pd.concat([above, chunk], ignore_index=True).fillna('')
+                data_rows, name_column = self.locate_table(chunk)
+                month_columns = None
+                if data_rows is not None:
+                    month_columns, _ = self.resolve_month_columns(chunk, int(data_rows[0]), name_column)
+                if not month_columns:
+                    above = chunk.tail(HEADER_ROWS)
+                    continue
+                layout = {'name_column': name_column, 'month_columns': month_columns}
+            else:
+                data_rows = self.find_data_rows(chunk)[1]
+            
+            region_rows = self.select_region_rows(chunk, data_rows, layout['name_column'])
+            if len(region_rows):
+                yield self.extract_regions({'df': chunk, 'region_rows': region_rows, **layout})
+    
+    def preview_table(self, df, region=None):
+        """
+        What ingestion would read from the head of a CSV/XLSX table: the month
+        header mapping and the 12 values of one region row (``region``, else
+        Config.DEFAULT_REGION, else the first region row). Raises InvalidUpload.
+        """
+        data_rows, name_column = self.locate_table(df)
+        if data_rows is None:
+            raise upload_cache.InvalidUpload(f"Tidak ada baris data wilayah dalam {len(df)} baris pertama")
+        region_rows = self.select_region_rows(df, data_rows, name_column)
+        if not len(region_rows):
+            raise upload_cache.InvalidUpload(f"Tidak ada baris data wilayah dalam {len(df)} baris pertama")
+        month_columns, error = self.resolve_month_columns(df, int(data_rows[0]), name_column)
+        if error:
+            raise upload_cache.InvalidUpload(error)
         
-        if isinstance(value, (int, float)):
-            return int(value)
+        names = df.iloc[region_rows, name_column].map(normalize_region).tolist()
+        wanted = normalize_region(region or Config.DEFAULT_REGION)
+        row = int(region_rows[names.index(wanted)]) if wanted in names else int(region_rows[0])
+        header = df.iloc[max(0, int(data_rows[0]) - HEADER_ROWS):int(data_rows[0])]
         
-        if isinstance(value, str):
-            cleaned = re.sub(r'[^\d]', '', str(value))
-            return int(cleaned) if cleaned else 0
+        values = []
+        for month in MONTHS:
+            position = month_columns.get(month)
+            values.append({
+                'month': month,
+                'column': position,
+                'label': ' '.join(header.iloc[:, position]).strip() if position is not None else None,
+                'value': parse_count(df.iat[row, position]) if position is not None else None
+            })
+        return {
+            'name_column': name_column,
+            'first_data_row': int(data_rows[0]),
+            'region': normalize_region(df.iat[row, name_column]),
+            'row': row,
+            'regions_in_preview': len(region_rows),
+            'months': values,
+            'total': sum(month['value'] or 0 for month in values)
+        }
+    
+    def preview_csv(self, source, region=None, rows=None):
+        """preview_table() of the first ``rows`` (Config.PREVIEW_ROWS) lines of a CSV"""
+        try:
+            df = self.read_csv(source, nrows=rows or Config.PREVIEW_ROWS)
+        except Exception as e:
+            raise upload_cache.InvalidUpload(f"Tidak bisa membaca file CSV: {str(e)}")
+        return self.preview_table(df, region)
+    
+    def preview_xlsx(self, source, region=None, rows=None):
+        """preview_table() of the first sheet whose first ``rows`` rows hold a table"""
+        with closing(self.iter_xlsx_chunks(source, rows or Config.PREVIEW_ROWS)) as chunks:
+            sheet = None
+            for title, chunk in chunks:
+                if title == sheet:
+                    continue  # only the head of each sheet
+                sheet = title
+                try:
+                    return {'sheet': title, **self.preview_table(chunk, region)}
+                except upload_cache.InvalidUpload:
+                    continue
+        raise upload_cache.InvalidUpload("Tidak ada tabel data wilayah di awal sheet mana pun dalam file XLSX")
+    
+    def process_csv_data(self, filepath, year, parsed=None, filename=None, progress=None, sha256=None):
+        def parse():
+            nonlocal parsed
+            if parsed is None:
+                valid, message, parsed = self.validate_csv_structure(filepath)
+                if not valid:
+                    raise upload_cache.InvalidUpload(message)
+            regions = self.extract_regions(parsed)
+            return zip(regions['region'].tolist(), [None] * len(regions),
+                       regions['month'].tolist(), regions['value'].tolist())
         
-        return 0
+        return self._ingest_regions(filepath, year, parse, filename, progress, sha256, 'CSV')
+    
+    def parse_xlsx(self, filepath):
+        """(region, None, month, value) rows of every sheet in a workbook"""
+        rows = []
+        for regions in self.iter_xlsx_regions(filepath):
+            rows.extend(zip(regions['region'].tolist(), [None] * len(regions),
+                            regions['month'].tolist(), regions['value'].tolist()))
+        if not rows:
+            raise upload_cache.InvalidUpload("Tidak ada tabel data wilayah di sheet mana pun dalam file XLSX")
+        return rows
     
-    def process_csv_data(self, filepath, year):
+    def process_xlsx_data(self, filepath, year, filename=None, progress=None, sha256=None):
+        return self._ingest_regions(filepath, year, lambda: self.parse_xlsx(filepath),
+                                    filename, progress, sha256, 'XLSX')
+    
+    def _ingest_regions(self, filepath, year, parse, filename, progress, sha256, label):
         try:
-            try:
-                df = pd.read_csv(filepath, header=[0,1,2])
-            except:
-                df = pd.read_csv(filepath)
-            
-            palembang_data = None
-            palembang_index = -1
-            
-            for index, row in df.iterrows():
-                first_col_value = str(row.iloc[0]) if len(row) > 0 else ""
-                if 'Palembang' in first_col_value:
-                    palembang_data = row
-                    palembang_index = index
-                    break
-            
-            if palembang_data is None:
-                return False, "Data Palembang tidak ditemukan"
-            
-            months = ['January', 'February', 'March', 'April', 'May', 'June', 
-                     'July', 'August', 'September', 'October', 'November', 'December']
-            
-            monthly_data = {}
-            
-            for i, month in enumerate(months):
-                col_index = -1
-                for j, col in enumerate(df.columns):
-                    col_str = str(col).lower()
-                    if month.lower() in col_str:
-                        col_index = j
-                        break
-                
-                if col_index != -1 and col_index < len(palembang_data):
-                    value = palembang_data.iloc[col_index]
-                    cleaned_value = self.clean_numeric_value(value)
-                    monthly_data[month] = cleaned_value
-                else:
-                    monthly_data[month] = 0
-            
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('DELETE FROM tourism_data WHERE year = ?', (year,))
-            
-            for month, value in monthly_data.items():
-                cursor.execute(
-                    'INSERT INTO tourism_data (year, month, value) VALUES (?, ?, ?)',
-                    (year, month, value)
-                )
-            
-            conn.commit()
-            conn.close()
-            
-            total_visitors = sum(monthly_data.values())
-            return True, f"Data Palembang tahun {year} berhasil diproses. Total visitors: {total_visitors:,}"
-            
+            result = upload_cache.ingest(filepath, year, parse, self.db_path, filename, sha256, progress)
+        except upload_cache.InvalidUpload as e:
+            return False, str(e)
         except Exception as e:
-            return False, f"Error processing CSV: {str(e)}"
+            return False, f"Error processing {label}: {str(e)}"
+        
+        if result['status'] == 'unchanged':
+            return True, f"Data tahun {year} tidak berubah (isi file sama dengan data yang sudah tersimpan)"
+        
+        rows = result['rows']
+        region_count = len({region for region, _, _, _ in rows})
+        return True, (f"Data {region_count} wilayah tahun {year} berhasil diproses "
+                      f"({result['written']} dari {len(rows)} baris berubah). "
+                      f"Total visitors: {sum(value for _, _, _, value in rows):,}")
     
     def process_pdf_data(self, filepath, year=None):
         try:
             from pdf_processor import PDFProcessor
-            pdf_processor = PDFProcessor()
+            pdf_processor = PDFProcessor(self.db_path)
             success, message = pdf_processor.process_pdf_for_database(filepath, year)
             return success, message
         except Exception as e:
             return False, f"Error processing PDF: {str(e)}"
     
     def get_uploaded_files_info(self):
-        conn = sqlite3.connect(self.db_path)
+        conn = get_connection(self.db_path)
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -160,7 +383,6 @@ class DataProcessor:
         ''')
         
         files = cursor.fetchall()
-        conn.close()
         
         result = []
         for file in files:
@@ -172,57 +394,39 @@ class DataProcessor:
         
         return result
     
-    def get_database_stats(self):
-        conn = sqlite3.connect(self.db_path)
+    def get_database_stats(self, region=None):
+        """Record count and years for one region (all regions if None), plus upload info"""
+        conn = get_connection(self.db_path)
         cursor = conn.cursor()
         
-        cursor.execute('SELECT COUNT(*) FROM tourism_data')
+        where, params = ('WHERE region = ?', (region,)) if region else ('', ())
+        
+        cursor.execute(f'SELECT COUNT(*) FROM tourism_data {where}', params)
         total_records = cursor.fetchone()[0]
         
-        cursor.execute('SELECT DISTINCT year FROM tourism_data ORDER BY year')
+        cursor.execute(f'SELECT DISTINCT year FROM tourism_data {where} ORDER BY year', params)
         years = [row[0] for row in cursor.fetchall()]
         
+        cursor.execute('SELECT COUNT(DISTINCT region) FROM tourism_data')
+        total_regions = cursor.fetchone()[0]
+        
         cursor.execute('SELECT COUNT(*) FROM uploaded_files')
         total_files = cursor.fetchone()[0]
         
         cursor.execute('SELECT MAX(upload_date) FROM uploaded_files')
         latest_update = cursor.fetchone()[0]
         
-        conn.close()
-        
         return {
             'total_records': total_records,
             'years_available': years,
             'total_files': total_files,
+            'total_regions': total_regions,
             'latest_update': latest_update,
             'data_available': total_records > 0
         }
     
-    def export_analysis_data(self, format='json'):
-        conn = sqlite3.connect(self.db_path)
-        
-        query = '''
-            SELECT year, month, value 
-            FROM tourism_data 
-            ORDER BY year, 
-            CASE month
-                WHEN 'January' THEN 1
-                WHEN 'February' THEN 2
-                WHEN 'March' THEN 3
-                WHEN 'April' THEN 4
-                WHEN 'May' THEN 5
-                WHEN 'June' THEN 6
-                WHEN 'July' THEN 7
-                WHEN 'August' THEN 8
-                WHEN 'September' THEN 9
-                WHEN 'October' THEN 10
-                WHEN 'November' THEN 11
-                WHEN 'December' THEN 12
-            END
-        '''
-        
-        df = pd.read_sql_query(query, conn)
-        conn.close()
+    def export_analysis_data(self, format='json', region=None):
+        df = get_series(self.db_path, region)
         
         if format == 'json':
             return df.to_json(orient='records', indent=2)
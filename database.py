@@ -0,0 +1,165 @@
+"""
+Shared SQLite connection management.
+
+Connections are pooled per database file and handed out once per request
+(stored on ``flask.g``) or once per thread outside a request, so every model,
+processor and route in the same request reuses a single connection.
+"""
+import logging
+import queue
+import sqlite3
+import threading
+
+from flask import g, has_app_context
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# PRAGMAs that report numeric codes instead of the names used in Config
+_PRAGMA_NAMES = {
+    'synchronous': {0: 'OFF', 1: 'NORMAL', 2: 'FULL', 3: 'EXTRA'},
+    'temp_store': {0: 'DEFAULT', 1: 'FILE', 2: 'MEMORY'},
+}
+
+
+def apply_pragmas(conn, pragmas=None):
+    """Apply the configured PRAGMA profile to a connection"""
+    pragmas = Config.SQLITE_PRAGMAS if pragmas is None else pragmas
+    for name, value in pragmas.items():
+        conn.execute(f'PRAGMA {name} = {value}')
+
+
+def read_pragmas(conn, names=None):
+    """Read the PRAGMA values actually in effect on a connection"""
+    names = names or Config.SQLITE_PRAGMAS.keys()
+    current = {}
+    for name in names:
+        value = conn.execute(f'PRAGMA {name}').fetchone()[0]
+        current[name] = _PRAGMA_NAMES.get(name, {}).get(value, value)
+    return current
+
+
+class ConnectionPool:
+    """Bounded pool of reusable connections to one SQLite database file"""
+
+    def __init__(self, db_path, size=None):
+        self.db_path = db_path
+        self.size = size or Config.DB_POOL_SIZE
+        self._idle = queue.LifoQueue(maxsize=self.size)
+        self._reported = False
+
+    def _connect(self):
+        # Pooled connections travel between worker threads, but only one
+        # request/thread holds a connection at a time.
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        apply_pragmas(conn)
+        if not self._reported:
+            # Once per database and process: the first connection shows what the build accepted
+            self._reported = True
+            report = pragma_report(conn)
+            logger.info("SQLite settings for %s: %s", self.db_path,
+                        ', '.join(f"{name}={setting['actual']}" for name, setting in report.items()))
+        return conn
+
+    def acquire(self):
+        """Take an idle connection or open a new one"""
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return self._connect()
+
+    def release(self, conn):
+        """Return a connection to the pool, discarding any open transaction"""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            self._idle.put_nowait(conn)
+        except (sqlite3.Error, queue.Full):
+            conn.close()
+
+    def close_all(self):
+        """Close every idle connection"""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+_thread_state = threading.local()
+
+
+def get_pool(db_path=None):
+    """Get (or create) the pool for a database file"""
+    db_path = db_path or Config.DATABASE
+    with _pools_lock:
+        pool = _pools.get(db_path)
+        if pool is None:
+            pool = ConnectionPool(db_path)
+            _pools[db_path] = pool
+        return pool
+
+
+def _held_connections():
+    if has_app_context():
+        if '_db_connections' not in g:
+            g._db_connections = {}
+        return g._db_connections
+    if not hasattr(_thread_state, 'connections'):
+        _thread_state.connections = {}
+    return _thread_state.connections
+
+
+def get_connection(db_path=None):
+    """
+    Get the connection for the current request (or thread).
+    Callers must not close it; it is returned to the pool on teardown.
+    """
+    db_path = db_path or Config.DATABASE
+    connections = _held_connections()
+    conn = connections.get(db_path)
+    if conn is None:
+        conn = get_pool(db_path).acquire()
+        connections[db_path] = conn
+    return conn
+
+
+def release_connections(exception=None):
+    """Return all connections held by the current request (or thread) to their pools"""
+    if has_app_context():
+        connections = g.pop('_db_connections', None)
+    else:
+        connections = getattr(_thread_state, 'connections', None)
+        _thread_state.connections = {}
+
+    for db_path, conn in (connections or {}).items():
+        get_pool(db_path).release(conn)
+
+
+def check_pragmas(db_path=None):
+    """Configured vs. effective PRAGMAs on the current connection (see pragma_report())"""
+    return pragma_report(get_connection(db_path))
+
+
+def pragma_report(conn):
+    """
+    Compare the configured PRAGMA profile with the settings in effect.
+    Returns {name: {'expected': ..., 'actual': ...}} and logs any mismatch
+    (e.g. mmap_size capped by the SQLite build, or WAL refused by the filesystem).
+    """
+    actual = read_pragmas(conn)
+    report = {}
+    for name, expected in Config.SQLITE_PRAGMAS.items():
+        report[name] = {'expected': expected, 'actual': actual[name]}
+        if str(actual[name]).upper() != str(expected).upper():
+            logger.warning("PRAGMA %s is %s (configured %s)", name, actual[name], expected)
+    return report
+
+
+def init_app(app):
+    """Register connection teardown on the Flask app"""
+    app.teardown_appcontext(release_connections)
@@ -0,0 +1,301 @@
+"""
+Monthly visitor forecasts.
+
+A region's year x month series (tourism_repository.get_series) is laid out
+as one monthly series and three seasonal models are fitted to it:
+
+- seasonal_naive: every future month repeats the same month of the last year
+- hw_additive: Holt-Winters with additive trend and seasonality (ETS A,A,A)
+- hw_multiplicative: Holt-Winters with multiplicative seasonality (ETS M,A,M)
+
+The Holt-Winters recursions make one pass over the months, vectorized across
+a grid of smoothing parameters, and keep the combination with the best
+likelihood. A fit stores each model's parameters, final state and in-sample
+error, plus backtest scores from refitting without each of the last
+Config.FORECAST_BACKTEST_YEARS complete years and forecasting them. Fits are
+cached per data version (analysis_cache), so a forecast request only
+projects a stored state forward.
+
+Prediction intervals use the ETS forecast variance. It is exact for the
+additive models and applied to relative errors for the multiplicative one.
+Intervals are clipped at zero.
+"""
+import numpy as np
+
+from config import Config
+from tourism_repository import MONTHS, data_version, get_series
+
+SEASON = 12
+MODELS = ('seasonal_naive', 'hw_additive', 'hw_multiplicative')
+# Two-sided standard normal quantiles of the supported interval levels (%)
+Z_SCORES = {80: 1.2816, 90: 1.6449, 95: 1.9600, 99: 2.5758}
+
+# Smoothing parameters tried by the Holt-Winters fits: alpha, with beta and
+# gamma as shares of their admissible ranges (beta < alpha, gamma < 1 - alpha)
+_alpha, _beta_share, _gamma_share = np.meshgrid(
+    np.linspace(0.05, 0.95, 10), (0.0, 0.05, 0.15, 0.4), (0.01, 0.1, 0.3, 0.6, 0.9), indexing='ij')
+ALPHA = _alpha.ravel()
+BETA = (_alpha * _beta_share).ravel()
+GAMMA = ((1 - _alpha) * _gamma_share).ravel()
+
+
+class ForecastUnavailable(Exception):
+    """Raised when there is too little (or unsuitable) history for a forecast"""
+
+
+def monthly_series(df):
+    """
+    (values, first_year, observed) of a get_series() frame. ``values`` runs
+    from January of the first year to the last month with data; months
+    missing in between are filled with that month's mean over the other
+    years, and ``observed`` marks the months that were in the data.
+    """
+    if df.empty:
+        raise ForecastUnavailable("Belum ada data kunjungan untuk wilayah ini")
+
+    years = df['year'].to_numpy(dtype=int)
+    first_year = int(years.min())
+    matrix = np.full((int(years.max()) - first_year + 1, SEASON), np.nan)
+    months = df['month'].map({month: i for i, month in enumerate(MONTHS)}).to_numpy(dtype=int)
+    matrix[years - first_year, months] = df['value'].to_numpy(dtype=float)
+
+    observed = ~np.isnan(matrix)
+    counts = observed.sum(axis=0)
+    month_means = np.where(counts > 0, np.nansum(matrix, axis=0) / np.maximum(counts, 1), np.nan)
+    month_means[np.isnan(month_means)] = np.nanmean(matrix)
+    values = np.where(observed, matrix, month_means).ravel()
+
+    last = np.flatnonzero(observed.ravel())[-1] + 1
+    return values[:last], first_year, observed.ravel()[:last]
+
+
+# ===== MODELS =====
+def fit_seasonal_naive(y):
+    """Last year's months; sigma from the year-over-year differences"""
+    if len(y) < SEASON:
+        return None
+    differences = y[SEASON:] - y[:-SEASON]
+    # With a single year there are no differences; use that year's spread
+    sigma = np.sqrt(np.mean(differences ** 2)) if len(differences) else np.std(y)
+    return {'params': {}, 'state': {'season': y[-SEASON:].tolist()},
+            'sigma': float(sigma), 'rmse': float(sigma)}
+
+
+def _holt_winters(y, multiplicative):
+    """
+    Run the ETS recursion for every (ALPHA, BETA, GAMMA) at once. Returns
+    (errors, fitted, level, trend, season) with one column/row per parameter
+    combination; errors are relative for the multiplicative model.
+    """
+    level0 = y[:SEASON].mean()
+    trend0 = (y[SEASON:2 * SEASON].mean() - level0) / SEASON
+    season0 = y[:SEASON] / level0 if multiplicative else y[:SEASON] - level0
+
+    level = np.full(len(ALPHA), level0)
+    trend = np.full(len(ALPHA), trend0)
+    season = np.tile(season0, (len(ALPHA), 1))
+    errors = np.empty((len(y), len(ALPHA)))
+    fitted = np.empty((len(y), len(ALPHA)))
+
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        for t, value in enumerate(y):
+            s = season[:, t % SEASON]
+            base = level + trend
+            if multiplicative:
+                mu = base * s
+                e = (value - mu) / mu
+                level = base * (1 + ALPHA * e)
+                trend = trend + BETA * base * e
+                season[:, t % SEASON] = s * (1 + GAMMA * e)
+            else:
+                mu = base + s
+                e = value - mu
+                level = base + ALPHA * e
+                trend = trend + BETA * e
+                season[:, t % SEASON] = s + GAMMA * e
+            errors[t] = e
+            fitted[t] = mu
+    return errors, fitted, level, trend, season
+
+
+def fit_holt_winters(y, multiplicative=False):
+    """Best grid point by likelihood, or None when the model does not apply"""
+    if len(y) < 2 * SEASON or (multiplicative and (y <= 0).any()):
+        return None
+
+    errors, fitted, level, trend, season = _holt_winters(y, multiplicative)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        criterion = len(y) * np.log((errors ** 2).sum(axis=0))
+        if multiplicative:
+            criterion += 2 * np.log(np.abs(fitted)).sum(axis=0)
+    criterion[~np.isfinite(criterion)] = np.inf
+    best = int(np.argmin(criterion))
+    if not np.isfinite(criterion[best]):
+        return None
+
+    # Seasonal state rotated so index 0 belongs to the month after the data
+    next_season = np.roll(season[best], -(len(y) % SEASON))
+    return {
+        'params': {'alpha': float(ALPHA[best]), 'beta': float(BETA[best]), 'gamma': float(GAMMA[best])},
+        'state': {'level': float(level[best]), 'trend': float(trend[best]), 'season': next_season.tolist()},
+        'sigma': float(np.sqrt(np.mean(errors[:, best] ** 2))),
+        'rmse': float(np.sqrt(np.mean((y - fitted[:, best]) ** 2)))
+    }
+
+
+FITTERS = {
+    'seasonal_naive': fit_seasonal_naive,
+    'hw_additive': lambda y: fit_holt_winters(y, multiplicative=False),
+    'hw_multiplicative': lambda y: fit_holt_winters(y, multiplicative=True),
+}
+
+
+def project(name, model, horizon, level=None):
+    """(mean, lower, upper) arrays for the next ``horizon`` months"""
+    z = Z_SCORES[level or Config.FORECAST_LEVEL]
+    h = np.arange(1, horizon + 1)
+    season = np.asarray(model['state']['season'])[(h - 1) % SEASON]
+
+    if name == 'seasonal_naive':
+        mean = season
+        spread = model['sigma'] * np.sqrt((h - 1) // SEASON + 1)
+    else:
+        params, state = model['params'], model['state']
+        trend_path = state['level'] + h * state['trend']
+        # ETS variance factor: 1 + sum over j < h of (alpha + beta*j + gamma*[j is a whole season])^2
+        j = h[:-1]
+        c = params['alpha'] + params['beta'] * j + params['gamma'] * (j % SEASON == 0)
+        variance = np.concatenate(([1.0], 1 + np.cumsum(c ** 2)))
+        if name == 'hw_multiplicative':
+            mean = trend_path * season
+            spread = np.abs(mean) * model['sigma'] * np.sqrt(variance)
+        else:
+            mean = trend_path + season
+            spread = model['sigma'] * np.sqrt(variance)
+
+    mean = np.maximum(mean, 0)
+    return mean, np.maximum(mean - z * spread, 0), mean + z * spread
+
+
+# ===== FITTING AND BACKTEST =====
+def backtest(y, first_year, observed, years=None):
+    """
+    Refit every model without each of the last ``years`` complete years
+    (default Config.FORECAST_BACKTEST_YEARS) and score its 12-month forecast
+    of that year. Returns one dict per (year, model).
+    """
+    years = years or Config.FORECAST_BACKTEST_YEARS
+    complete = [first_year + i for i in range(len(y) // SEASON)
+                if observed[i * SEASON:(i + 1) * SEASON].all()]
+
+    scores = []
+    for year in complete[-years:]:
+        start = (year - first_year) * SEASON
+        train, actual = y[:start], y[start:start + SEASON]
+        for name in MODELS:
+            model = FITTERS[name](train)
+            if model is None:
+                continue
+            mean, lower, upper = project(name, model, SEASON)
+            error = actual - mean
+            positive = actual > 0
+            scores.append({
+                'year': year,
+                'model': name,
+                'mae': float(np.mean(np.abs(error))),
+                'rmse': float(np.sqrt(np.mean(error ** 2))),
+                'mape': float(np.mean(np.abs(error[positive]) / actual[positive]) * 100) if positive.any() else None,
+                'coverage': float(np.mean((actual >= lower) & (actual <= upper)))
+            })
+    return scores
+
+
+def fit_series(df):
+    """Every applicable model fitted to a get_series() frame, with backtest scores"""
+    y, first_year, observed = monthly_series(df)
+    models = {name: FITTERS[name](y) for name in MODELS}
+    models = {name: model for name, model in models.items() if model is not None}
+    if not models:
+        raise ForecastUnavailable(f"Data belum cukup untuk peramalan (minimal {SEASON} bulan, "
+                                  f"tersedia {len(y)})")
+
+    scores = backtest(y, first_year, observed)
+    for name, model in models.items():
+        own = [score for score in scores if score['model'] == name]
+        mapes = [score['mape'] for score in own if score['mape'] is not None]
+        model['backtest'] = {
+            'years': [score['year'] for score in own],
+            'mae': float(np.mean([score['mae'] for score in own])),
+            'rmse': float(np.mean([score['rmse'] for score in own])),
+            'mape': float(np.mean(mapes)) if mapes else None,
+            'coverage': float(np.mean([score['coverage'] for score in own]))
+        } if own else None
+
+    # 'auto': lowest backtest MAE among models scored on every held-out year, else lowest in-sample RMSE
+    folds = {score['year'] for score in scores}
+    scored = [name for name, model in models.items()
+              if model['backtest'] and set(model['backtest']['years']) == folds]
+    if scored:
+        best = min(scored, key=lambda name: models[name]['backtest']['mae'])
+    else:
+        best = min(models, key=lambda name: models[name]['rmse'])
+
+    last = len(y) - 1
+    return {
+        'history_end': {'year': first_year + last // SEASON, 'month': last % SEASON + 1},
+        'months': len(y),
+        'best': best,
+        'models': models,
+        'backtest': scores
+    }
+
+
+class Forecaster:
+    """Forecasts of tourism_data series, fitted once per data version"""
+
+    def __init__(self, db_path=None, cache=None):
+        self.db_path = db_path or Config.DATABASE
+        self.cache = cache  # analysis_cache.AnalysisCache, or None to refit on every call
+
+    def fit(self, region=None):
+        region = region or Config.DEFAULT_REGION
+        compute = lambda: fit_series(get_series(self.db_path, region))
+        if self.cache is None:
+            return compute()
+        return self.cache.get_or_compute(self.db_path, f"forecast:{region}", data_version(self.db_path), compute)
+
+    def forecast(self, region=None, horizon=None, model='auto', level=None, include_backtest=False):
+        """
+        The next ``horizon`` months (default Config.FORECAST_HORIZON) of a
+        region with ``level``% prediction intervals. ``model`` is one of
+        MODELS or 'auto' (the best backtest score).
+        """
+        horizon = horizon or Config.FORECAST_HORIZON
+        level = level or Config.FORECAST_LEVEL
+        fit = self.fit(region)
+        name = fit['best'] if model == 'auto' else model
+        if name not in fit['models']:
+            raise ForecastUnavailable(f"Model {name} tidak bisa dipakai untuk data wilayah ini")
+
+        mean, lower, upper = project(name, fit['models'][name], horizon, level)
+        end = fit['history_end']
+        months = end['year'] * SEASON + end['month'] + np.arange(horizon)  # 0-based month after the last one
+        result = {
+            'region': region or Config.DEFAULT_REGION,
+            'model': name,
+            'level': level,
+            'horizon': horizon,
+            'history_end': f"{end['year']}-{end['month']:02d}",
+            'history_months': fit['months'],
+            'forecast': [
+                {'period': f"{m // SEASON}-{m % SEASON + 1:02d}", 'year': int(m // SEASON),
+                 'month': MONTHS[m % SEASON], 'value': round(float(v), 1),
+                 'lower': round(float(lo), 1), 'upper': round(float(hi), 1)}
+                for m, v, lo, hi in zip(months, mean, lower, upper)
+            ],
+            'models': {model_name: {key: fitted[key] for key in ('params', 'rmse', 'backtest')}
+                       for model_name, fitted in fit['models'].items()}
+        }
+        if include_backtest:
+            result['backtest'] = fit['backtest']
+        return result
@@ -0,0 +1,137 @@
+"""
+Background ingestion jobs.
+
+Uploads are handed to a small in-process thread pool so the HTTP request only
+has to save the file. Job state (status, progress, result message) lives in
+the ``jobs`` table, so ``/api/jobs/<id>`` can report on a job from any
+request. A job function takes a ``progress`` keyword argument, a callback
+accepting ``done``, ``total`` and ``rows``, and returns (success, message)
+like the processors do.
+"""
+import logging
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import database
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFull(Exception):
+    """Raised when Config.JOB_QUEUE_SIZE jobs are already queued or running"""
+
+
+class JobQueue:
+    """Bounded pool of worker threads running jobs recorded in the jobs table"""
+
+    def __init__(self, db_path=None, workers=None, max_pending=None):
+        self.db_path = db_path or Config.DATABASE
+        self.workers = workers or Config.JOB_WORKERS
+        self._slots = threading.BoundedSemaphore(max_pending or Config.JOB_QUEUE_SIZE)
+        self._executor = None
+        self._lock = threading.Lock()
+        # Same format as the jobs table's CURRENT_TIMESTAMP defaults (UTC)
+        self._created_at = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+        self._interrupted_checked = False
+
+    def _get_executor(self):
+        # Started on first use so importing the app does not spawn threads
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='job')
+            return self._executor
+
+    def submit(self, kind, func, *args, filename=None, **kwargs):
+        """Record a queued job, schedule ``func(*args, progress=..., **kwargs)`` and return the job id"""
+        if not self._slots.acquire(blocking=False):
+            raise QueueFull(f"{Config.JOB_QUEUE_SIZE} jobs are already waiting")
+
+        job_id = uuid.uuid4().hex
+        try:
+            conn = database.get_connection(self.db_path)
+            conn.execute(
+                "INSERT INTO jobs (id, kind, status, filename) VALUES (?, ?, 'queued', ?)",
+                (job_id, kind, filename)
+            )
+            conn.commit()
+            self._get_executor().submit(self._run, job_id, func, args, kwargs)
+        except Exception:
+            self._slots.release()
+            raise
+        return job_id
+
+    def _run(self, job_id, func, args, kwargs):
+        conn = database.get_connection(self.db_path)
+        try:
+            conn.execute(
+                "UPDATE jobs SET status = 'running', started_at = CURRENT_TIMESTAMP WHERE id = ?",
+                (job_id,)
+            )
+            conn.commit()
+
+            def progress(done=None, total=None, rows=None):
+                conn.execute('''
+                    UPDATE jobs SET
+                        progress_done = COALESCE(?, progress_done),
+                        progress_total = COALESCE(?, progress_total),
+                        rows_written = COALESCE(?, rows_written)
+                    WHERE id = ?
+                ''', (done, total, rows, job_id))
+                conn.commit()
+
+            success, message = func(*args, progress=progress, **kwargs)
+            self._finish(conn, job_id, 'done' if success else 'failed', message)
+        except Exception as e:
+            logger.exception("Job %s failed", job_id)
+            self._finish(conn, job_id, 'failed', str(e))
+        finally:
+            # Worker threads have no app context; hand the connection back explicitly
+            database.release_connections()
+            self._slots.release()
+
+    def _finish(self, conn, job_id, status, message):
+        if conn.in_transaction:
+            conn.rollback()
+        conn.execute(
+            'UPDATE jobs SET status = ?, message = ?, finished_at = CURRENT_TIMESTAMP WHERE id = ?',
+            (status, message, job_id)
+        )
+        conn.commit()
+
+    def get(self, job_id):
+        """Job record as a dict, or None"""
+        row = database.get_connection(self.db_path).execute(
+            'SELECT * FROM jobs WHERE id = ?', (job_id,)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def fail_interrupted(self):
+        """
+        Mark jobs left queued/running by an earlier server process as failed;
+        runs once per queue, on the first request this process serves. Only
+        jobs created before the queue was are touched, so jobs that another
+        live worker process submits later are left alone.
+        """
+        with self._lock:
+            if self._interrupted_checked:
+                return 0
+            self._interrupted_checked = True
+        conn = database.get_connection(self.db_path)
+        cursor = conn.execute('''
+            UPDATE jobs SET status = 'failed', message = 'Dihentikan: server dimulai ulang',
+                            finished_at = CURRENT_TIMESTAMP
+            WHERE status IN ('queued', 'running') AND created_at < ?
+        ''', (self._created_at,))
+        conn.commit()
+        if cursor.rowcount:
+            logger.warning("Marked %d interrupted job(s) as failed", cursor.rowcount)
+        return cursor.rowcount
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait)
+                self._executor = None
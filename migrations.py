@@ -0,0 +1,416 @@
+"""
+Versioned schema migrations for the tourism database.
+
+The schema version is stored in ``PRAGMA user_version``. Each migration is a
+function registered with ``@migration(version, description)`` and is applied
+once, in version order, by ``upgrade()``.
+
+Migrations that backfill every row of a large table use
+``backfill_in_batches()``, which commits every ``Config.MIGRATION_BATCH_SIZE``
+rows so readers and writers are never locked out for long. Because of those
+intermediate commits a migration can be interrupted half way; every migration
+must therefore be safe to run again from the start.
+"""
+import logging
+
+from config import Config
+from tourism_repository import MONTHS
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS = []
+
+
+def migration(version, description):
+    """Register a migration step"""
+    def decorator(func):
+        MIGRATIONS.append((version, description, func))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return func
+    return decorator
+
+
+# ===== ENGINE =====
+def get_version(conn):
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def _set_version(conn, version):
+    conn.execute(f'PRAGMA user_version = {int(version)}')
+
+
+def status(conn):
+    """List every known migration with whether it has been applied"""
+    current = get_version(conn)
+    return [{
+        'version': version,
+        'description': description,
+        'applied': version <= current
+    } for version, description, _ in MIGRATIONS]
+
+
+def pending(conn):
+    current = get_version(conn)
+    return [m for m in MIGRATIONS if m[0] > current]
+
+
+def upgrade(conn, target=None):
+    """Apply pending migrations up to ``target`` (default: latest). Returns the versions applied."""
+    applied = []
+    for version, description, func in pending(conn):
+        if target is not None and version > target:
+            break
+
+        logger.info("Applying migration %s: %s", version, description)
+        if conn.in_transaction:
+            conn.commit()
+        conn.execute('BEGIN')
+        try:
+            func(conn)
+            if not conn.in_transaction:
+                conn.execute('BEGIN')
+            _set_version(conn, version)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            logger.exception("Migration %s failed", version)
+            raise
+        applied.append(version)
+    return applied
+
+
+# ===== BATCH HELPERS =====
+def backfill_in_batches(conn, table, assignment, where, batch_size=None):
+    """
+    Run ``UPDATE table SET assignment WHERE where`` in rowid ranges,
+    committing after each range. ``where`` must stop matching rows once they
+    are updated so an interrupted backfill resumes where it left off.
+    """
+    batch_size = batch_size or Config.MIGRATION_BATCH_SIZE
+    low, high = conn.execute(f'SELECT MIN(rowid), MAX(rowid) FROM {table} WHERE {where}').fetchone()
+    if low is None:
+        return 0
+
+    updated = 0
+    for start in range(low, high + 1, batch_size):
+        cursor = conn.execute(
+            f'UPDATE {table} SET {assignment} WHERE rowid >= ? AND rowid < ? AND ({where})',
+            (start, start + batch_size)
+        )
+        conn.commit()
+        updated += cursor.rowcount
+    return updated
+
+
+def _columns(conn, table):
+    return [row[1] for row in conn.execute(f'PRAGMA table_info({table})')]
+
+
+# ===== MIGRATIONS =====
+@migration(1, 'Create base tables')
+def create_base_tables(conn):
+    # Monthly visitor series imported from BPS CSV/PDF files
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS tourism_data (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            year INTEGER,
+            month TEXT,
+            value INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS uploaded_files (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            filename TEXT,
+            year INTEGER,
+            upload_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            role TEXT NOT NULL,
+            email TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Hotel name and total rooms per hotel user
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS hotel_info (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            hotel_name TEXT NOT NULL,
+            total_rooms INTEGER NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        )
+    ''')
+
+    # Daily hotel data
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS hotel_data (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            date TEXT NOT NULL,
+            occupied_rooms INTEGER NOT NULL,
+            guest_count INTEGER NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        )
+    ''')
+
+    # Daily tourism site data (separate from the tourism_data monthly series)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS tourism_site_data (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            date TEXT NOT NULL,
+            origin TEXT NOT NULL,
+            total_visitors INTEGER NOT NULL,
+            male_adult INTEGER NOT NULL,
+            female_adult INTEGER NOT NULL,
+            male_child INTEGER NOT NULL,
+            female_child INTEGER NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        )
+    ''')
+
+
+@migration(2, 'Unique (user_id, date) / (year, month) and lookup indexes')
+def add_lookup_indexes(conn):
+    """
+    Daily hotel/tourism rows are unique per (user_id, date) and the monthly
+    series is unique per (year, month). Existing duplicates are collapsed to
+    the most recently inserted row before the unique indexes are built.
+    SQLite cannot add table constraints in place, so uniqueness is enforced
+    with unique indexes, which ON CONFLICT targets accept.
+    """
+    conn.execute('''
+        DELETE FROM hotel_data WHERE id NOT IN (
+            SELECT MAX(id) FROM hotel_data GROUP BY user_id, date
+        )
+    ''')
+    conn.execute('''
+        DELETE FROM tourism_site_data WHERE id NOT IN (
+            SELECT MAX(id) FROM tourism_site_data GROUP BY user_id, date
+        )
+    ''')
+    conn.execute('''
+        DELETE FROM tourism_data WHERE id NOT IN (
+            SELECT MAX(id) FROM tourism_data GROUP BY year, month
+        )
+    ''')
+
+    conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS ux_hotel_data_user_date ON hotel_data (user_id, date)')
+    conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS ux_tourism_site_data_user_date ON tourism_site_data (user_id, date)')
+    conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS ux_tourism_data_year_month ON tourism_data (year, month)')
+
+    # Admin views list every user's rows newest first
+    conn.execute('CREATE INDEX IF NOT EXISTS ix_hotel_data_date ON hotel_data (date)')
+    conn.execute('CREATE INDEX IF NOT EXISTS ix_tourism_site_data_date ON tourism_site_data (date)')
+    conn.execute('CREATE INDEX IF NOT EXISTS ix_hotel_info_user ON hotel_info (user_id)')
+
+
+@migration(3, 'Integer month_num on tourism_data with covering (year, month_num, value) index')
+def add_month_number(conn):
+    """
+    Store the month as an integer next to its name so the monthly series can
+    be read in (year, month) order straight from an index instead of sorting
+    on a CASE expression.
+    """
+    if 'month_num' not in _columns(conn, 'tourism_data'):
+        conn.execute('ALTER TABLE tourism_data ADD COLUMN month_num INTEGER')
+    conn.commit()
+
+    cases = ' '.join(f"WHEN '{month}' THEN {i}" for i, month in enumerate(MONTHS, 1))
+    backfill_in_batches(
+        conn, 'tourism_data',
+        f'month_num = CASE month {cases} END',
+        f"month_num IS NULL AND month IN ({', '.join(repr(m) for m in MONTHS)})"
+    )
+
+    conn.execute('CREATE INDEX IF NOT EXISTS ix_tourism_data_year_month_num ON tourism_data (year, month_num, value)')
+
+
+# ===== MONTHLY SUMMARIES =====
+def rebuild_monthly_summaries(conn):
+    """Recompute hotel/tourism monthly summary tables from the daily rows"""
+    conn.execute('DELETE FROM hotel_monthly_summary')
+    conn.execute('''
+        INSERT INTO hotel_monthly_summary (user_id, month, occupied_rooms_sum, guest_sum, day_count)
+        SELECT user_id, substr(date, 1, 7), SUM(occupied_rooms), SUM(guest_count), COUNT(*)
+        FROM hotel_data
+        GROUP BY user_id, substr(date, 1, 7)
+    ''')
+
+    conn.execute('DELETE FROM tourism_monthly_summary')
+    conn.execute('''
+        INSERT INTO tourism_monthly_summary
+            (user_id, month, total_visitors_sum, male_adult_sum, female_adult_sum,
+             male_child_sum, female_child_sum, day_count)
+        SELECT user_id, substr(date, 1, 7), SUM(total_visitors), SUM(male_adult), SUM(female_adult),
+               SUM(male_child), SUM(female_child), COUNT(*)
+        FROM tourism_site_data
+        GROUP BY user_id, substr(date, 1, 7)
+    ''')
+
+
+# Trigger bodies: add a daily row to its month, or take it back out
+_HOTEL_SUMMARY_ADD = '''
+    INSERT INTO hotel_monthly_summary (user_id, month, occupied_rooms_sum, guest_sum, day_count)
+    VALUES (NEW.user_id, substr(NEW.date, 1, 7), NEW.occupied_rooms, NEW.guest_count, 1)
+    ON CONFLICT (user_id, month) DO UPDATE SET
+        occupied_rooms_sum = occupied_rooms_sum + excluded.occupied_rooms_sum,
+        guest_sum = guest_sum + excluded.guest_sum,
+        day_count = day_count + 1;
+'''
+_HOTEL_SUMMARY_REMOVE = '''
+    UPDATE hotel_monthly_summary SET
+        occupied_rooms_sum = occupied_rooms_sum - OLD.occupied_rooms,
+        guest_sum = guest_sum - OLD.guest_count,
+        day_count = day_count - 1
+    WHERE user_id = OLD.user_id AND month = substr(OLD.date, 1, 7);
+    DELETE FROM hotel_monthly_summary
+    WHERE user_id = OLD.user_id AND month = substr(OLD.date, 1, 7) AND day_count <= 0;
+'''
+_TOURISM_SUMMARY_ADD = '''
+    INSERT INTO tourism_monthly_summary
+        (user_id, month, total_visitors_sum, male_adult_sum, female_adult_sum,
+         male_child_sum, female_child_sum, day_count)
+    VALUES (NEW.user_id, substr(NEW.date, 1, 7), NEW.total_visitors, NEW.male_adult, NEW.female_adult,
+            NEW.male_child, NEW.female_child, 1)
+    ON CONFLICT (user_id, month) DO UPDATE SET
+        total_visitors_sum = total_visitors_sum + excluded.total_visitors_sum,
+        male_adult_sum = male_adult_sum + excluded.male_adult_sum,
+        female_adult_sum = female_adult_sum + excluded.female_adult_sum,
+        male_child_sum = male_child_sum + excluded.male_child_sum,
+        female_child_sum = female_child_sum + excluded.female_child_sum,
+        day_count = day_count + 1;
+'''
+_TOURISM_SUMMARY_REMOVE = '''
+    UPDATE tourism_monthly_summary SET
+        total_visitors_sum = total_visitors_sum - OLD.total_visitors,
+        male_adult_sum = male_adult_sum - OLD.male_adult,
+        female_adult_sum = female_adult_sum - OLD.female_adult,
+        male_child_sum = male_child_sum - OLD.male_child,
+        female_child_sum = female_child_sum - OLD.female_child,
+        day_count = day_count - 1
+    WHERE user_id = OLD.user_id AND month = substr(OLD.date, 1, 7);
+    DELETE FROM tourism_monthly_summary
+    WHERE user_id = OLD.user_id AND month = substr(OLD.date, 1, 7) AND day_count <= 0;
+'''
+
+
+@migration(4, 'Trigger-maintained monthly summaries for hotel_data and tourism_site_data')
+def add_monthly_summaries(conn):
+    """
+    Per user per month ('YYYY-MM') totals kept current by triggers, so
+    dashboards read O(months) rows instead of every daily row.
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS hotel_monthly_summary (
+            user_id INTEGER NOT NULL,
+            month TEXT NOT NULL,
+            occupied_rooms_sum INTEGER NOT NULL DEFAULT 0,
+            guest_sum INTEGER NOT NULL DEFAULT 0,
+            day_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, month)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS tourism_monthly_summary (
+            user_id INTEGER NOT NULL,
+            month TEXT NOT NULL,
+            total_visitors_sum INTEGER NOT NULL DEFAULT 0,
+            male_adult_sum INTEGER NOT NULL DEFAULT 0,
+            female_adult_sum INTEGER NOT NULL DEFAULT 0,
+            male_child_sum INTEGER NOT NULL DEFAULT 0,
+            female_child_sum INTEGER NOT NULL DEFAULT 0,
+            day_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, month)
+        ) WITHOUT ROWID
+    ''')
+
+    for table, add_sql, remove_sql in [
+        ('hotel_data', _HOTEL_SUMMARY_ADD, _HOTEL_SUMMARY_REMOVE),
+        ('tourism_site_data', _TOURISM_SUMMARY_ADD, _TOURISM_SUMMARY_REMOVE),
+    ]:
+        conn.execute(f'DROP TRIGGER IF EXISTS trg_{table}_summary_insert')
+        conn.execute(f'DROP TRIGGER IF EXISTS trg_{table}_summary_update')
+        conn.execute(f'DROP TRIGGER IF EXISTS trg_{table}_summary_delete')
+        conn.execute(f'CREATE TRIGGER trg_{table}_summary_insert AFTER INSERT ON {table} BEGIN {add_sql} END')
+        conn.execute(f'CREATE TRIGGER trg_{table}_summary_update AFTER UPDATE ON {table} BEGIN {remove_sql} {add_sql} END')
+        conn.execute(f'CREATE TRIGGER trg_{table}_summary_delete AFTER DELETE ON {table} BEGIN {remove_sql} END')
+
+    rebuild_monthly_summaries(conn)
+
+
+@migration(5, 'Region column on tourism_data, unique per (region, year, month)')
+def add_region(conn):
+    """
+    BPS files list every regency/city; the series so far was Palembang only,
+    so existing rows take 'Palembang' as their region.
+    """
+    if 'region' not in _columns(conn, 'tourism_data'):
+        conn.execute("ALTER TABLE tourism_data ADD COLUMN region TEXT NOT NULL DEFAULT 'Palembang'")
+
+    conn.execute('DROP INDEX IF EXISTS ux_tourism_data_year_month')
+    conn.execute('DROP INDEX IF EXISTS ix_tourism_data_year_month_num')
+    conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS ux_tourism_data_region_year_month ON tourism_data (region, year, month)')
+    conn.execute('CREATE INDEX IF NOT EXISTS ix_tourism_data_region_series ON tourism_data (region, year, month_num, value)')
+
+
+@migration(6, 'Background ingestion jobs table')
+def add_jobs(conn):
+    """Status and progress of queued uploads (see jobs.py)"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            kind TEXT NOT NULL,
+            status TEXT NOT NULL,
+            filename TEXT,
+            progress_done INTEGER NOT NULL DEFAULT 0,
+            progress_total INTEGER,
+            rows_written INTEGER NOT NULL DEFAULT 0,
+            message TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            started_at TIMESTAMP,
+            finished_at TIMESTAMP
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS ix_jobs_status ON jobs (status)')
+
+
+@migration(7, 'Content hash of uploaded files and the parsed-rows cache')
+def add_upload_hashes(conn):
+    """Upload dedup (see upload_cache.py); older uploads keep a NULL hash"""
+    if 'sha256' not in _columns(conn, 'uploaded_files'):
+        conn.execute('ALTER TABLE uploaded_files ADD COLUMN sha256 TEXT')
+    conn.execute('CREATE INDEX IF NOT EXISTS ix_uploaded_files_year ON uploaded_files (year, id)')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS parsed_uploads (
+            sha256 TEXT PRIMARY KEY,
+            rows TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        ) WITHOUT ROWID
+    ''')
+
+
+@migration(8, 'Data version counter for tourism_data')
+def add_data_versions(conn):
+    """Bumped once per write that changed tourism_data; caches key on it"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS data_versions (
+            dataset TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        ) WITHOUT ROWID
+    ''')
+    conn.execute("INSERT OR IGNORE INTO data_versions (dataset, version) VALUES ('tourism_data', 0)")
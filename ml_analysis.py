@@ -1,17 +1,17 @@
 import pandas as pd
 import numpy as np
-from sklearn.cluster import KMeans
-from sklearn.preprocessing import StandardScaler
-from sklearn.metrics import silhouette_score
-import sqlite3
 from datetime import datetime
 import random
 
+from clustering import ckmeans, silhouette_1d
+from config import Config
+from tourism_repository import data_version, get_series
+
 class TourismAnalyzer:
-    def __init__(self, db_path='tourism.db'):
+    def __init__(self, db_path='tourism.db', cache=None):
         self.db_path = db_path
-        self.scaler = StandardScaler()
         self.last_suggestions = []
+        self.cache = cache  # analysis_cache.AnalysisCache, or None to always recompute
 
     def _convert_to_json_serializable(self, obj):
         if isinstance(obj, (np.integer, int)):
@@ -31,30 +31,8 @@ class TourismAnalyzer:
         else:
             return str(obj)
 
-    def get_tourism_data(self):
-        conn = sqlite3.connect(self.db_path)
-        query = '''
-            SELECT year, month, value 
-            FROM tourism_data 
-            ORDER BY year, 
-            CASE month
-                WHEN 'January' THEN 1
-                WHEN 'February' THEN 2
-                WHEN 'March' THEN 3
-                WHEN 'April' THEN 4
-                WHEN 'May' THEN 5
-                WHEN 'June' THEN 6
-                WHEN 'July' THEN 7
-                WHEN 'August' THEN 8
-                WHEN 'September' THEN 9
-                WHEN 'October' THEN 10
-                WHEN 'November' THEN 11
-                WHEN 'December' THEN 12
-            END
-        '''
-        df = pd.read_sql_query(query, conn)
-        conn.close()
-        return df
+    def get_tourism_data(self, region=None):
+        return get_series(self.db_path, region)
 
     def analyze_seasonal_distribution(self, df):
         if df.empty:
@@ -72,11 +50,11 @@ class TourismAnalyzer:
                        'July', 'August', 'September', 'October', 'November', 'December']
         monthly_avg = monthly_avg.reindex(months_order).fillna(0)
         
-        # Reshape for sklearn (n_samples, n_features)
         X = monthly_avg.values.reshape(-1, 1)
         
         # 2. Apply K-Means Clustering
-        # We use 3 clusters for Low, Medium, High seasons
+        # We use 3 clusters for Low, Medium, High seasons; with one dimension
+        # the optimal clustering is computed exactly (see clustering.py)
         try:
             # Check if we have enough variance/data points for 3 clusters
             n_unique = len(np.unique(X))
@@ -88,13 +66,8 @@ class TourismAnalyzer:
                  centroids = np.array([[np.mean(X)]])
                  silhouette = 0
             else:
-                kmeans = KMeans(n_clusters=n_clusters, random_state=42, n_init=10)
-                kmeans_labels = kmeans.fit_predict(X)
-                centroids = kmeans.cluster_centers_
-                try:
-                    silhouette = silhouette_score(X, kmeans_labels)
-                except:
-                    silhouette = 0 # Can happen if all points are nearly identical
+                kmeans_labels, centroids = ckmeans(X.ravel(), n_clusters)
+                silhouette = silhouette_1d(X.ravel(), kmeans_labels)
         except Exception as e:
             # Severe fallback
             print(f"KMeans Error: {e}")
@@ -365,8 +338,20 @@ class TourismAnalyzer:
 
         return pivot_df
 
-    def get_detailed_analysis(self):
-        df = self.get_tourism_data()
+    def get_detailed_analysis(self, region=None):
+        """
+        Suggestions, patterns and summary of a region. With a cache, the result
+        is reused until tourism_data changes (suggestions stay the same for
+        that data version instead of being re-drawn on every call).
+        """
+        if self.cache is None:
+            return self._compute_detailed_analysis(region)
+        return self.cache.get_or_compute(self.db_path, region or Config.DEFAULT_REGION,
+                                         data_version(self.db_path),
+                                         lambda: self._compute_detailed_analysis(region))
+
+    def _compute_detailed_analysis(self, region=None):
+        df = self.get_tourism_data(region)
 
         if df.empty:
             return {
@@ -402,8 +387,9 @@ class TourismAnalyzer:
 
         return self._convert_to_json_serializable(result)
 
-    def get_seasonal_analysis_for_charts(self):
-        df = self.get_tourism_data()
+    def get_seasonal_analysis_for_charts(self, region=None, df=None):
+        if df is None:
+            df = self.get_tourism_data(region)
         seasonal_data = self.analyze_seasonal_distribution(df)
 
         return {
@@ -412,11 +398,11 @@ class TourismAnalyzer:
             'monthly_performance': seasonal_data['monthly_performance']
         }
 
-    def get_analysis_for_export(self):
+    def get_analysis_for_export(self, region=None):
         """Get analysis data in format suitable for Excel export"""
-        detailed_analysis = self.get_detailed_analysis()
+        detailed_analysis = self.get_detailed_analysis(region)
         
-        df = self.get_tourism_data()
+        df = self.get_tourism_data(region)
         
         export_data = {
             'suggestions': detailed_analysis.get('suggestions', []),
@@ -1,10 +1,77 @@
 """
 Database models for multi-role authentication system
 """
-import sqlite3
 from datetime import datetime
 from werkzeug.security import generate_password_hash, check_password_hash
 
+from database import get_connection
+
+
+def encode_cursor(row):
+    """Keyset cursor for a row ordered by (date, id)"""
+    return f"{row['date']}:{row['id']}"
+
+
+def decode_cursor(cursor):
+    """Parse a 'date:id' cursor, returns None if malformed"""
+    try:
+        date, row_id = cursor.rsplit(':', 1)
+        return date, int(row_id)
+    except (AttributeError, ValueError):
+        return None
+
+
+def _filter_clause(alias, filters):
+    """Build WHERE conditions for user/hotel/date-range filters"""
+    conditions = []
+    params = []
+    if filters.get('username'):
+        conditions.append('u.username = ?')
+        params.append(filters['username'])
+    if filters.get('hotel_name'):
+        conditions.append('hi.hotel_name = ?')
+        params.append(filters['hotel_name'])
+    if filters.get('date_from'):
+        conditions.append(f'{alias}.date >= ?')
+        params.append(filters['date_from'])
+    if filters.get('date_to'):
+        conditions.append(f'{alias}.date <= ?')
+        params.append(filters['date_to'])
+    return conditions, params
+
+
+def _keyset_page(conn, select_sql, alias, filters, page_size, after=None, before=None):
+    """
+    Fetch one page of rows ordered newest first by (date, id).
+    ``after`` continues past a cursor (older rows), ``before`` goes back to
+    newer rows. Returns (rows, next_cursor, prev_cursor).
+    """
+    conditions, params = _filter_clause(alias, filters)
+
+    backwards = before is not None and decode_cursor(before) is not None
+    position = decode_cursor(before) if backwards else decode_cursor(after)
+    if position:
+        conditions.append(f"({alias}.date, {alias}.id) {'>' if backwards else '<'} (?, ?)")
+        params.extend(position)
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+    order = 'ASC' if backwards else 'DESC'
+    rows = conn.execute(
+        f'{select_sql} {where} ORDER BY {alias}.date {order}, {alias}.id {order} LIMIT ?',
+        params + [page_size + 1]
+    ).fetchall()
+
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if backwards:
+        rows.reverse()
+
+    if not rows:
+        return rows, None, None
+    if backwards:
+        return rows, encode_cursor(rows[-1]), encode_cursor(rows[0]) if has_more else None
+    return rows, encode_cursor(rows[-1]) if has_more else None, encode_cursor(rows[0]) if position else None
+
 
 class User:
     """User model for authentication"""
@@ -32,7 +99,7 @@ class User:
     def create(db_path, username, password, role, email):
         """Create new user"""
         password_hash = generate_password_hash(password)
-        conn = sqlite3.connect(db_path)
+        conn = get_connection(db_path)
         cursor = conn.cursor()
         cursor.execute('''
             INSERT INTO users (username, password_hash, role, email)
@@ -40,18 +107,15 @@ class User:
         ''', (username, password_hash, role, email))
         conn.commit()
         user_id = cursor.lastrowid
-        conn.close()
         return user_id
     
     @staticmethod
     def get_by_id(db_path, user_id):
         """Get user by ID"""
-        conn = sqlite3.connect(db_path)
-        conn.row_factory = sqlite3.Row
+        conn = get_connection(db_path)
         cursor = conn.cursor()
         cursor.execute('SELECT * FROM users WHERE id = ?', (user_id,))
         row = cursor.fetchone()
-        conn.close()
         
         if row:
             return User(
@@ -67,12 +131,10 @@ class User:
     @staticmethod
     def get_by_username(db_path, username):
         """Get user by username"""
-        conn = sqlite3.connect(db_path)
-        conn.row_factory = sqlite3.Row
+        conn = get_connection(db_path)
         cursor = conn.cursor()
         cursor.execute('SELECT * FROM users WHERE username = ?', (username,))
         row = cursor.fetchone()
-        conn.close()
         
         if row:
             return User(
@@ -88,12 +150,10 @@ class User:
     @staticmethod
     def get_all(db_path):
         """Get all users"""
-        conn = sqlite3.connect(db_path)
-        conn.row_factory = sqlite3.Row
+        conn = get_connection(db_path)
         cursor = conn.cursor()
         cursor.execute('SELECT * FROM users ORDER BY created_at ASC')
         rows = cursor.fetchall()
-        conn.close()
         
         users = []
         for row in rows:
@@ -109,7 +169,7 @@ class User:
     @staticmethod
     def update(db_path, user_id, username=None, email=None, password=None, role=None):
         """Update user"""
-        conn = sqlite3.connect(db_path)
+        conn = get_connection(db_path)
         cursor = conn.cursor()
         
         updates = []
@@ -133,17 +193,14 @@ class User:
             query = f"UPDATE users SET {', '.join(updates)} WHERE id = ?"
             cursor.execute(query, params)
             conn.commit()
-        
-        conn.close()
     
     @staticmethod
     def delete(db_path, user_id):
         """Delete user"""
-        conn = sqlite3.connect(db_path)
+        conn = get_connection(db_path)
         cursor = conn.cursor()
         cursor.execute('DELETE FROM users WHERE id = ?', (user_id,))
         conn.commit()
-        conn.close()
 
 
 class HotelData:
@@ -152,8 +209,7 @@ class HotelData:
     @staticmethod
     def get_hotel_info(db_path, user_id):
         """Get hotel info for user"""
-        conn = sqlite3.connect(db_path)
-        conn.row_factory = sqlite3.Row
+        conn = get_connection(db_path)
         cursor = conn.cursor()
         cursor.execute('''
             SELECT hotel_name, total_rooms 
@@ -161,7 +217,6 @@ class HotelData:
             WHERE user_id = ?
         ''', (user_id,))
         row = cursor.fetchone()
-        conn.close()
         
         if row:
             return {
@@ -173,7 +228,7 @@ class HotelData:
     @staticmethod
     def set_hotel_info(db_path, user_id, hotel_name, total_rooms):
         """Set hotel info for user"""
-        conn = sqlite3.connect(db_path)
+        conn = get_connection(db_path)
         cursor = conn.cursor()
         
         # Check if exists
@@ -193,38 +248,36 @@ class HotelData:
             ''', (user_id, hotel_name, total_rooms))
         
         conn.commit()
-        conn.close()
     
     @staticmethod
-    def add_daily_data(db_path, user_id, date, occupied_rooms):
-        """Add daily hotel data"""
-        conn = sqlite3.connect(db_path)
+    def add_daily_data(db_path, user_id, date, occupied_rooms, guest_count):
+        """Add daily hotel data, returns False if the date already exists"""
+        conn = get_connection(db_path)
         cursor = conn.cursor()
         cursor.execute('''
-            INSERT INTO hotel_data (user_id, date, occupied_rooms)
-            VALUES (?, ?, ?)
-        ''', (user_id, date, occupied_rooms))
+            INSERT INTO hotel_data (user_id, date, occupied_rooms, guest_count)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(user_id, date) DO NOTHING
+        ''', (user_id, date, occupied_rooms, guest_count))
         conn.commit()
-        conn.close()
+        return cursor.rowcount > 0
     
     @staticmethod
     def check_date_exists(db_path, user_id, date):
         """Check if data exists for date"""
-        conn = sqlite3.connect(db_path)
+        conn = get_connection(db_path)
         cursor = conn.cursor()
         cursor.execute('''
             SELECT id FROM hotel_data 
             WHERE user_id = ? AND date = ?
         ''', (user_id, date))
         exists = cursor.fetchone()
-        conn.close()
         return exists is not None
     
     @staticmethod
     def get_all_data(db_path, user_id):
         """Get all hotel data for user"""
-        conn = sqlite3.connect(db_path)
-        conn.row_factory = sqlite3.Row
+        conn = get_connection(db_path)
         cursor = conn.cursor()
         cursor.execute('''
             SELECT * FROM hotel_data 
@@ -232,7 +285,6 @@ class HotelData:
             ORDER BY date DESC
         ''', (user_id,))
         rows = cursor.fetchall()
-        conn.close()
         
         data = []
         for row in rows:
@@ -248,7 +300,7 @@ class HotelData:
     @staticmethod
     def update_occupied_rooms(db_path, data_id, occupied_rooms):
         """Update occupied rooms for a record"""
-        conn = sqlite3.connect(db_path)
+        conn = get_connection(db_path)
         cursor = conn.cursor()
         cursor.execute('''
             UPDATE hotel_data 
@@ -256,13 +308,11 @@ class HotelData:
             WHERE id = ?
         ''', (occupied_rooms, data_id))
         conn.commit()
-        conn.close()
     
     @staticmethod
     def get_all_hotels_data(db_path):
         """Get all hotel data from all users (for admin)"""
-        conn = sqlite3.connect(db_path)
-        conn.row_factory = sqlite3.Row
+        conn = get_connection(db_path)
         cursor = conn.cursor()
         cursor.execute('''
             SELECT hd.*, hi.hotel_name, u.username
@@ -272,7 +322,6 @@ class HotelData:
             ORDER BY hd.date DESC
         ''')
         rows = cursor.fetchall()
-        conn.close()
         
         data = []
         for row in rows:
@@ -287,49 +336,113 @@ class HotelData:
             })
         return data
 
+    
+    @staticmethod
+    def get_hotels_data_page(db_path, page_size, after=None, before=None, **filters):
+        """
+        One page of hotel data from all users (for admin), newest first.
+        Filters: hotel_name, username, date_from, date_to.
+        """
+        conn = get_connection(db_path)
+        rows, next_cursor, prev_cursor = _keyset_page(conn, '''
+            SELECT hd.id, hd.date, hd.occupied_rooms, hd.guest_count, hd.created_at,
+                   hi.hotel_name, hi.total_rooms, u.username
+            FROM hotel_data hd
+            JOIN hotel_info hi ON hd.user_id = hi.user_id
+            JOIN users u ON hd.user_id = u.id
+        ''', 'hd', filters, page_size, after, before)
+        
+        data = []
+        for row in rows:
+            occupancy_rate = (row['occupied_rooms'] / row['total_rooms'] * 100) if row['total_rooms'] > 0 else 0
+            data.append({
+                'id': row['id'],
+                'date': row['date'],
+                'hotel_name': row['hotel_name'],
+                'username': row['username'],
+                'occupied_rooms': row['occupied_rooms'],
+                'total_rooms': row['total_rooms'],
+                'guest_count': row['guest_count'],
+                'occupancy_rate': round(occupancy_rate, 1),
+                'created_at': row['created_at']
+            })
+        return {'items': data, 'next_cursor': next_cursor, 'prev_cursor': prev_cursor}
+    
+    @staticmethod
+    def get_hotels_data_summary(db_path, **filters):
+        """Entry count and totals over all pages for the same filters"""
+        conditions, params = _filter_clause('hd', filters)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        # One row: cheaper on the request's SQLite connection than through DuckDB
+        row = get_connection(db_path).execute(f'''
+            SELECT COUNT(*) AS total_entries,
+                   COALESCE(SUM(hd.guest_count), 0) AS total_guests,
+                   COALESCE(SUM(hd.occupied_rooms), 0) AS total_occupied_rooms
+            FROM hotel_data hd
+            JOIN hotel_info hi ON hd.user_id = hi.user_id
+            JOIN users u ON hd.user_id = u.id
+            {where}
+        ''', params).fetchone()
+        return {name: int(row[name]) for name in row.keys()}
+    
+    @staticmethod
+    def get_monthly_summary(db_path, user_id):
+        """Per-month totals for a hotel user, newest month first (from hotel_monthly_summary)"""
+        conn = get_connection(db_path)
+        rows = conn.execute('''
+            SELECT month, occupied_rooms_sum, guest_sum, day_count
+            FROM hotel_monthly_summary
+            WHERE user_id = ?
+            ORDER BY month DESC
+        ''', (user_id,)).fetchall()
+        return [dict(row) for row in rows]
+    
+    @staticmethod
+    def get_hotel_names(db_path):
+        """All configured hotel names (for admin filters)"""
+        conn = get_connection(db_path)
+        rows = conn.execute('SELECT DISTINCT hotel_name FROM hotel_info ORDER BY hotel_name').fetchall()
+        return [row['hotel_name'] for row in rows]
+
 
 class TourismData:
-    """Tourism data model"""
+    """Tourism site daily data model (tourism_site_data)"""
     
     @staticmethod
     def add_data(db_path, user_id, date, origin, total_visitors, male_adult, female_adult, male_child, female_child):
         """Add tourism data"""
-        conn = sqlite3.connect(db_path)
+        conn = get_connection(db_path)
         cursor = conn.cursor()
         cursor.execute('''
-            INSERT INTO tourism_data 
+            INSERT INTO tourism_site_data 
             (user_id, date, origin, total_visitors, male_adult, female_adult, male_child, female_child)
             VALUES (?, ?, ?, ?, ?, ?, ?, ?)
         ''', (user_id, date, origin, total_visitors, male_adult, female_adult, male_child, female_child))
         conn.commit()
-        conn.close()
     
     @staticmethod
     def check_date_exists(db_path, user_id, date):
         """Check if data exists for date"""
-        conn = sqlite3.connect(db_path)
+        conn = get_connection(db_path)
         cursor = conn.cursor()
         cursor.execute('''
-            SELECT id FROM tourism_data 
+            SELECT id FROM tourism_site_data 
             WHERE user_id = ? AND date = ?
         ''', (user_id, date))
         exists = cursor.fetchone()
-        conn.close()
         return exists is not None
     
     @staticmethod
     def get_all_data(db_path, user_id):
         """Get all tourism data for user"""
-        conn = sqlite3.connect(db_path)
-        conn.row_factory = sqlite3.Row
+        conn = get_connection(db_path)
         cursor = conn.cursor()
         cursor.execute('''
-            SELECT * FROM tourism_data 
+            SELECT * FROM tourism_site_data 
             WHERE user_id = ?
             ORDER BY date DESC
         ''', (user_id,))
         rows = cursor.fetchall()
-        conn.close()
         
         data = []
         for row in rows:
@@ -349,7 +462,7 @@ class TourismData:
     @staticmethod
     def update_data(db_path, data_id, origin=None, total_visitors=None, male_adult=None, female_adult=None, male_child=None, female_child=None):
         """Update tourism data"""
-        conn = sqlite3.connect(db_path)
+        conn = get_connection(db_path)
         cursor = conn.cursor()
         
         updates = []
@@ -376,26 +489,22 @@ class TourismData:
         
         if updates:
             params.append(data_id)
-            query = f"UPDATE tourism_data SET {', '.join(updates)} WHERE id = ?"
+            query = f"UPDATE tourism_site_data SET {', '.join(updates)} WHERE id = ?"
             cursor.execute(query, params)
             conn.commit()
-        
-        conn.close()
     
     @staticmethod
     def get_all_tourism_data(db_path):
         """Get all tourism data from all users (for admin)"""
-        conn = sqlite3.connect(db_path)
-        conn.row_factory = sqlite3.Row
+        conn = get_connection(db_path)
         cursor = conn.cursor()
         cursor.execute('''
             SELECT td.*, u.username
-            FROM tourism_data td
+            FROM tourism_site_data td
             JOIN users u ON td.user_id = u.id
             ORDER BY td.date DESC
         ''')
         rows = cursor.fetchall()
-        conn.close()
         
         data = []
         for row in rows:
@@ -412,3 +521,65 @@ class TourismData:
                 'created_at': row['created_at']
             })
         return data
+    
+    @staticmethod
+    def get_tourism_data_page(db_path, page_size, after=None, before=None, **filters):
+        """
+        One page of tourism data from all users (for admin), newest first.
+        Filters: username, date_from, date_to.
+        """
+        conn = get_connection(db_path)
+        rows, next_cursor, prev_cursor = _keyset_page(conn, '''
+            SELECT td.id, td.date, td.origin, td.total_visitors,
+                   td.male_adult, td.female_adult, td.male_child, td.female_child,
+                   td.created_at, u.username
+            FROM tourism_site_data td
+            JOIN users u ON td.user_id = u.id
+        ''', 'td', filters, page_size, after, before)
+        
+        data = []
+        for row in rows:
+            data.append({
+                'id': row['id'],
+                'date': row['date'],
+                'origin': row['origin'],
+                'username': row['username'],
+                'total_visitors': row['total_visitors'],
+                'male_adult': row['male_adult'],
+                'female_adult': row['female_adult'],
+                'male_child': row['male_child'],
+                'female_child': row['female_child'],
+                'total_adults': row['male_adult'] + row['female_adult'],
+                'total_children': row['male_child'] + row['female_child'],
+                'created_at': row['created_at']
+            })
+        return {'items': data, 'next_cursor': next_cursor, 'prev_cursor': prev_cursor}
+    
+    @staticmethod
+    def get_monthly_summary(db_path, user_id):
+        """Per-month totals for a tourism user, newest month first (from tourism_monthly_summary)"""
+        conn = get_connection(db_path)
+        rows = conn.execute('''
+            SELECT month, total_visitors_sum, male_adult_sum, female_adult_sum,
+                   male_child_sum, female_child_sum, day_count
+            FROM tourism_monthly_summary
+            WHERE user_id = ?
+            ORDER BY month DESC
+        ''', (user_id,)).fetchall()
+        return [dict(row) for row in rows]
+    
+    @staticmethod
+    def get_tourism_data_summary(db_path, **filters):
+        """Entry count and totals over all pages for the same filters"""
+        conditions, params = _filter_clause('td', filters)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        # One row: cheaper on the request's SQLite connection than through DuckDB
+        row = get_connection(db_path).execute(f'''
+            SELECT COUNT(*) AS total_entries,
+                   COALESCE(SUM(td.total_visitors), 0) AS total_visitors,
+                   COALESCE(SUM(td.male_child + td.female_child), 0) AS total_children
+            FROM tourism_site_data td
+            JOIN users u ON td.user_id = u.id
+            {where}
+        ''', params).fetchone()
+        return {name: int(row[name]) for name in row.keys()}
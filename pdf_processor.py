@@ -1,131 +1,328 @@
+import numpy as np
 import pandas as pd
 import pdfplumber
 import re
 import os
+import logging
+import multiprocessing
+import time
 from datetime import datetime
-import sqlite3
+
+import upload_cache
+from config import Config
+from utils import parse_count, parse_counts
+
+logger = logging.getLogger(__name__)
+
+MONTH_MAPPING = {
+    'januari': 'January', 'februari': 'February', 'maret': 'March',
+    'april': 'April', 'mei': 'May', 'juni': 'June',
+    'juli': 'July', 'agustus': 'August', 'september': 'September',
+    'oktober': 'October', 'november': 'November', 'desember': 'December'
+}
+MONTH_NAMES = '|'.join(MONTH_MAPPING)
+# Any month name on the page; pages without one hold no visitor table
+TEXT_MONTH_PATTERN = re.compile(rf'\b({MONTH_NAMES})\b', re.IGNORECASE)
+# A text-layer line that starts like a month row: "Januari 102.023 500 102.523"
+MONTH_LINE_PATTERN = re.compile(rf'^\s*({MONTH_NAMES})\s+([\d-].*)$', re.IGNORECASE | re.MULTILINE)
+# Counts with optional thousands separators, or '-' for none
+COUNT_PATTERN = re.compile(r'\d{1,3}(?:[.,]\d{3})+|\d+|-')
+
+# Year printed on a page, most specific first (re.search: only the first hit is needed)
+YEAR_PATTERNS = (re.compile(r'TAHUN\s+(\d{4})'), re.compile(r'Tahun\s+(\d{4})'), re.compile(r'(\d{4})'))
+
+# Table header rows name at least one of these; a header cell maps to the first
+# role it contains, in this order ('Jumlah Total' columns are not the total)
+HEADER_KEYWORD_PATTERN = re.compile(r'bulan|nusantara|manca|jumlah')
+HEADER_ROLES = (('bulan', 'month'), ('nusantara', 'nusantara'), ('manca', 'manca_negara'), ('jumlah', 'total'))
+TEXT_COUNT_ROLES = ('nusantara', 'manca_negara', 'total')
+
+# Extraction paths, in report order (see PDFProcessor.extract_table_data)
+PAGE_PATHS = ('text', 'table', 'skipped', 'timeout')
+
+# Pools are started from JobQueue threads, and forking a multithreaded process
+# can copy a lock held by another thread into the child; workers are started
+# from a single-threaded fork server (or spawned where there is none) instead.
+POOL_CONTEXT = multiprocessing.get_context(
+    'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn')
+if POOL_CONTEXT.get_start_method() == 'forkserver':
+    POOL_CONTEXT.set_forkserver_preload(['pdf_processor'])
+
+# Document opened once per pool worker (see _open_worker_pdf)
+_worker_pdf = None
+
+
+def _open_worker_pdf(pdf_path):
+    global _worker_pdf
+    _worker_pdf = pdfplumber.open(pdf_path)
+
+
+def text_header_roles(line):
+    """
+    Count-column roles in the order a text-layer header line names them after
+    'Bulan' ("Bulan Wisatawan Mancanegara Wisatawan Nusantara Jumlah"), or None
+    unless it names each of them once. A title such as "Jumlah Wisatawan
+    Nusantara dan Mancanegara per Bulan" names none after 'Bulan'.
+    """
+    lowered = line.lower()
+    start = lowered.find('bulan')
+    if start < 0:
+        return None
+    roles = [role for match in HEADER_KEYWORD_PATTERN.finditer(lowered, start + len('bulan'))
+             for keyword, role in HEADER_ROLES if keyword == match.group()]
+    return roles if sorted(roles) == sorted(TEXT_COUNT_ROLES) else None
+
+
+def parse_text_rows(text):
+    """
+    (month, nusantara, mancanegara, jumlah) rows read straight from a page's
+    text layer, with the count columns in the order of the header line above
+    them (see text_header_roles()). None unless every month line sits under
+    such a header, has exactly three counts and they add up; those pages go
+    to table extraction instead.
+    """
+    roles = None
+    rows = []
+    for line in text.splitlines():
+        header = text_header_roles(line)
+        if header:
+            roles = header
+            continue
+        match = MONTH_LINE_PATTERN.match(line)
+        if not match:
+            continue
+        month, rest = match.groups()
+        if TEXT_MONTH_PATTERN.search(rest):
+            continue  # a period such as "Januari - Desember 2023", not a month row
+        tokens = rest.split()
+        if roles is None or len(tokens) != 3 or not all(COUNT_PATTERN.fullmatch(token) for token in tokens):
+            return None
+        counts = dict(zip(roles, (parse_count(token) for token in tokens)))
+        if counts['nusantara'] + counts['manca_negara'] != counts['total']:
+            return None
+        rows.append((MONTH_MAPPING[month.lower()], counts['nusantara'], counts['manca_negara'], counts['total']))
+    return rows or None
+
+
+def _extract_page(page_index, pdf=None):
+    """
+    (path, text, payload, seconds) for one page; runs in a pool worker unless
+    ``pdf`` is given. The cheap text layer is read first: pages without a
+    month name are 'skipped', pages whose month lines parse take the 'text'
+    path (payload: parse_text_rows() rows) and only the rest pay for
+    pdfplumber's table extraction ('table', payload: raw tables).
+    """
+    started = time.perf_counter()
+    page = (pdf or _worker_pdf).pages[page_index]
+    try:
+        text = page.extract_text() or ''
+        if not TEXT_MONTH_PATTERN.search(text):
+            path, payload = 'skipped', None
+        else:
+            payload = parse_text_rows(text)
+            path = 'text'
+            if payload is None:
+                path, payload = 'table', page.extract_tables()
+    finally:
+        page.close()
+    return path, text, payload, time.perf_counter() - started
+
 
 class PDFProcessor:
-    def __init__(self):
-        self.month_mapping = {
-            'januari': 'January', 'februari': 'February', 'maret': 'March',
-            'april': 'April', 'mei': 'May', 'juni': 'June',
-            'juli': 'July', 'agustus': 'August', 'september': 'September',
-            'oktober': 'October', 'november': 'November', 'desember': 'December'
-        }
+    def __init__(self, db_path=None):
+        self.db_path = db_path or Config.DATABASE
+        self.month_mapping = MONTH_MAPPING
+        self.last_report = None
+    
+    def sniff_pdf_header(self, head):
+        """A PDF starts with '%PDF-' (readers allow junk before it within the first KB)"""
+        if b'%PDF-' not in head:
+            return False, "File bukan PDF yang valid"
+        return True, "OK"
     
     def extract_year_from_pdf(self, text):
-        year_pattern = r'TAHUN\s+(\d{4})'
-        match = re.search(year_pattern, text)
-        if match:
-            return int(match.group(1))
-        
-        year_patterns = [
-            r'Tahun\s+(\d{4})',
-            r'(\d{4})',
-        ]
-        
-        for pattern in year_patterns:
-            matches = re.findall(pattern, text)
-            if matches:
-                return int(matches[0])
+        for pattern in YEAR_PATTERNS:
+            match = pattern.search(text)
+            if match:
+                return int(match.group(1))
         
         return datetime.now().year
     
     def clean_numeric_value(self, value):
-        if pd.isna(value) or value == '':
-            return 0
-        
-        if isinstance(value, (int, float)):
-            return int(value)
-        
-        if isinstance(value, str):
-            cleaned = re.sub(r'[^\d]', '', str(value).replace('.', ''))
-            return int(cleaned) if cleaned else 0
-        
-        return 0
+        return parse_count(value)
     
-    def extract_table_data(self, pdf_path):
+    def extract_table_data(self, pdf_path, progress=None, workers=None):
+        """
+        Visitor records of every page. The pages/seconds spent on each
+        extraction path are kept in ``self.last_report`` and logged.
+        """
         all_data = []
+        report = {path: {'pages': 0, 'seconds': 0.0} for path in PAGE_PATHS}
         
-        with pdfplumber.open(pdf_path) as pdf:
-            for page in pdf.pages:
-                text = page.extract_text()
+        for path, text, payload, seconds in self.extract_pages(pdf_path, progress, workers):
+            report[path]['pages'] += 1
+            report[path]['seconds'] += seconds
+            if path == 'text':
                 year = self.extract_year_from_pdf(text)
-                
-                tables = page.extract_tables()
-                for table in tables:
+                all_data.extend({'year': year, 'month': month, 'nusantara': nusantara,
+                                 'manca_negara': manca, 'total': total}
+                                for month, nusantara, manca, total in payload)
+            elif path == 'table':
+                year = self.extract_year_from_pdf(text)
+                for table in payload:
                     processed_data = self.process_table(table, year, text)
                     if processed_data:
                         all_data.extend(processed_data)
         
+        self.last_report = report
+        logger.info("Extracted %s: %s", os.path.basename(pdf_path),
+                    ', '.join(f"{path} {r['pages']} pages/{r['seconds']:.2f}s" for path, r in report.items()))
         return all_data
     
-    def process_table(self, table, year, page_text):
-        data_rows = []
+    def extract_pages(self, pdf_path, progress=None, workers=None):
+        """
+        _extract_page() results for every page, in page order. With more than one worker
+        the pages are extracted in a process pool (pdfplumber is CPU-bound);
+        a page that takes longer than Config.PDF_PAGE_TIMEOUT is logged and
+        skipped, and the pool is replaced so later pages do not queue behind
+        its still-busy worker.
+        """
+        workers = workers or Config.PDF_WORKERS
+        with pdfplumber.open(pdf_path) as pdf:
+            page_count = len(pdf.pages)
+            if progress:
+                progress(done=0, total=page_count)
+            
+            if workers <= 1 or page_count <= 1:
+                pages = []
+                for page_index in range(page_count):
+                    pages.append(_extract_page(page_index, pdf))
+                    if progress:
+                        progress(done=page_index + 1)
+                return pages
+        
+        pages = []
+        while len(pages) < page_count:
+            first = len(pages)
+            pool = POOL_CONTEXT.Pool(min(workers, page_count - first), _open_worker_pdf, (pdf_path,))
+            try:
+                pending = [pool.apply_async(_extract_page, (page_index,)) for page_index in range(first, page_count)]
+                for page_index, result in enumerate(pending, first):
+                    try:
+                        pages.append(result.get(Config.PDF_PAGE_TIMEOUT))
+                    except multiprocessing.TimeoutError:
+                        logger.warning("Page %d of %s timed out after %ss, skipped",
+                                       page_index + 1, pdf_path, Config.PDF_PAGE_TIMEOUT)
+                        pages.append(('timeout', '', None, float(Config.PDF_PAGE_TIMEOUT)))
+                    if progress:
+                        progress(done=page_index + 1)
+                    if pages[-1][0] == 'timeout':
+                        # Its worker is still busy: recycle the pool for the remaining pages
+                        break
+            finally:
+                # terminate() also kills a worker still stuck on a timed-out page
+                pool.terminate()
+                pool.join()
         
+        return pages
+    
+    def header_columns(self, cells):
+        """{role: position} of the HEADER_ROLES named in a lowercased header row"""
+        columns = {}
+        for position, cell in enumerate(cells):
+            role = next((role for keyword, role in HEADER_ROLES if keyword in cell), None)
+            if role and not (role == 'total' and 'total' in cell):
+                columns[role] = position
+        return columns
+    
+    def process_table(self, table, year, page_text):
+        """
+        Visitor records of one raw pdfplumber table. Header rows (any cell
+        naming a HEADER_ROLES keyword) set the count columns for the month
+        rows below them; each cell is stripped and lowercased once, and the
+        counts are cleaned column-wise at the end.
+        """
         header_found = False
-        nusantara_col = -1
-        manca_col = -1
-        total_col = -1
-        bulan_col = -1
+        columns = {}
+        months, count_cells = [], {'nusantara': [], 'manca_negara': [], 'total': []}
         
-        for i, row in enumerate(table):
-            if not row or all(cell is None or cell == '' for cell in row):
+        for row in table:
+            if not row:
+                continue
+            cells = ['' if cell is None else str(cell).strip().lower() for cell in row]
+            if not any(cells):
                 continue
             
-            row_text = ' '.join([str(cell) for cell in row if cell])
-            if any(keyword in row_text.lower() for keyword in ['bulan', 'nusantara', 'manca', 'jumlah']):
+            if any(HEADER_KEYWORD_PATTERN.search(cell) for cell in cells):
                 header_found = True
-                for j, cell in enumerate(row):
-                    if cell:
-                        cell_lower = str(cell).lower()
-                        if 'bulan' in cell_lower:
-                            bulan_col = j
-                        elif 'nusantara' in cell_lower:
-                            nusantara_col = j
-                        elif 'manca' in cell_lower:
-                            manca_col = j
-                        elif 'jumlah' in cell_lower and 'total' not in cell_lower:
-                            total_col = j
+                columns.update(self.header_columns(cells))
                 continue
             
-            if header_found and row[0] and any(str(cell).strip() for cell in row if cell):
-                bulan = None
-                nusantara = 0
-                manca = 0
-                total = 0
-                
-                for j, cell in enumerate(row):
-                    if cell and str(cell).strip():
-                        cell_lower = str(cell).strip().lower()
-                        if cell_lower in self.month_mapping:
-                            bulan = self.month_mapping[cell_lower]
-                            break
-                
-                if not bulan:
+            if not header_found or not cells[0]:
+                continue
+            month = next((MONTH_MAPPING[cell] for cell in cells if cell in MONTH_MAPPING), None)
+            if not month:
+                continue
+            
+            months.append(month)
+            for role, values in count_cells.items():
+                position = columns.get(role)
+                values.append(row[position] if position is not None and position < len(row) else None)
+        
+        if not months:
+            return []
+        nusantara = parse_counts(count_cells['nusantara'])
+        manca = parse_counts(count_cells['manca_negara'])
+        total = np.where([bool(cell) for cell in count_cells['total']],
+                         parse_counts(count_cells['total']), nusantara + manca)
+        
+        return [{'year': year, 'month': month, 'nusantara': n, 'manca_negara': m, 'total': t}
+                for month, n, m, t in zip(months, nusantara.tolist(), manca.tolist(), total.tolist())]
+    
+    def preview_pdf(self, source):
+        """
+        Records of the first page with month rows (searching at most
+        Config.PREVIEW_PDF_PAGES pages), with the header mapping used to read
+        them. Raises InvalidUpload when none of those pages has any.
+        """
+        with pdfplumber.open(source) as pdf:
+            for index in range(min(len(pdf.pages), Config.PREVIEW_PDF_PAGES)):
+                path, text, payload, seconds = _extract_page(index, pdf)
+                if path == 'skipped':
                     continue
                 
-                if nusantara_col != -1 and nusantara_col < len(row) and row[nusantara_col]:
-                    nusantara = self.clean_numeric_value(row[nusantara_col])
-                
-                if manca_col != -1 and manca_col < len(row) and row[manca_col]:
-                    manca = self.clean_numeric_value(row[manca_col])
-                
-                if total_col != -1 and total_col < len(row) and row[total_col]:
-                    total = self.clean_numeric_value(row[total_col])
+                year = self.extract_year_from_pdf(text)
+                if path == 'text':
+                    # Month name, then the three counts in the order of the first header line
+                    roles = next(filter(None, map(text_header_roles, text.splitlines())))
+                    header = [{'role': role, 'column': position, 'label': None}
+                              for position, role in enumerate(['month'] + roles)]
+                    records = [{'year': year, 'month': month, 'nusantara': nusantara,
+                                'manca_negara': manca, 'total': total}
+                               for month, nusantara, manca, total in payload]
                 else:
-                    total = nusantara + manca
-                
-                data_rows.append({
-                    'year': year,
-                    'month': bulan,
-                    'nusantara': nusantara,
-                    'manca_negara': manca,
-                    'total': total
-                })
-        
-        return data_rows
+                    header, records = [], []
+                    for table in payload:
+                        records = self.process_table(table, year, text)
+                        if records:
+                            header = self.table_header(table)
+                            break
+                if records:
+                    return {'page': index + 1, 'path': path, 'year': year,
+                            'header': header, 'records': records}
+        raise upload_cache.InvalidUpload(
+            f"Tidak ada tabel bulan dalam {Config.PREVIEW_PDF_PAGES} halaman pertama PDF")
+    
+    def table_header(self, table):
+        """[{role, column, label}] from the header rows of a raw table"""
+        header = {}
+        for row in table:
+            cells = ['' if cell is None else str(cell).strip() for cell in row or ()]
+            lowered = [cell.lower() for cell in cells]
+            if any(HEADER_KEYWORD_PATTERN.search(cell) for cell in lowered):
+                for role, position in self.header_columns(lowered).items():
+                    header[role] = {'role': role, 'column': position, 'label': cells[position]}
+        return list(header.values())
     
     def pdf_to_csv(self, pdf_path, output_csv_path):
         try:
@@ -142,33 +339,21 @@ class PDFProcessor:
         except Exception as e:
             return False, f"Error konversi PDF: {str(e)}"
     
-    def process_pdf_for_database(self, pdf_path, year=None):
-        try:
-            data = self.extract_table_data(pdf_path)
-            
+    def process_pdf_for_database(self, pdf_path, year=None, filename=None, progress=None, sha256=None):
+        def parse():
+            data = self.extract_table_data(pdf_path, progress)
             if not data:
-                return False, "Tidak ada data yang berhasil diekstrak dari PDF"
-            
-            conn = sqlite3.connect('tourism.db')
-            cursor = conn.cursor()
-            
-            for record in data:
-                use_year = year if year else record['year']
-                
-                cursor.execute(
-                    'DELETE FROM tourism_data WHERE year = ? AND month = ?',
-                    (use_year, record['month'])
-                )
-                
-                cursor.execute(
-                    'INSERT INTO tourism_data (year, month, value) VALUES (?, ?, ?)',
-                    (use_year, record['month'], record['total'])
-                )
-            
-            conn.commit()
-            conn.close()
-            
-            return True, f"Berhasil memproses PDF. {len(data)} records disimpan ke database."
-            
+                raise upload_cache.InvalidUpload("Tidak ada data yang berhasil diekstrak dari PDF")
+            return [(Config.DEFAULT_REGION, record['year'], record['month'], record['total']) for record in data]
+        
+        try:
+            result = upload_cache.ingest(pdf_path, year, parse, self.db_path, filename, sha256, progress)
+        except upload_cache.InvalidUpload as e:
+            return False, str(e)
         except Exception as e:
-            return False, f"Error processing PDF: {str(e)}"
\ No newline at end of file
+            return False, f"Error processing PDF: {str(e)}"
+        
+        if result['status'] == 'unchanged':
+            return True, "PDF tidak berubah (isi sama dengan data yang sudah tersimpan), tidak ada data yang ditulis."
+        return True, (f"Berhasil memproses PDF. {result['written']} dari {len(result['rows'])} "
+                      f"records berubah dan disimpan ke database.")
@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+
+from clustering import ckmeans, silhouette_1d
+
+
+def within_ss(values, labels):
+    values = np.asarray(values, dtype=float)
+    return sum(((values[labels == c] - values[labels == c].mean()) ** 2).sum() for c in np.unique(labels))
+
+
+def test_ckmeans_orders_clusters_by_centroid():
+    labels, centroids = ckmeans([90, 10, 50, 11, 52, 91], 3)
+    assert labels.tolist() == [2, 0, 1, 0, 1, 2]
+    assert centroids.tolist() == [10.5, 51.0, 90.5]
+
+
+def test_ckmeans_keeps_ties_together():
+    values = [5, 1, 5, 9, 1, 9, 5, 1]
+    labels, centroids = ckmeans(values, 3)
+    assert centroids.tolist() == [1.0, 5.0, 9.0]
+    for value in set(values):
+        assert len({label for v, label in zip(values, labels) if v == value}) == 1
+
+
+def test_ckmeans_ties_do_not_depend_on_input_order():
+    values = np.array([4.0, 4.0, 1.0, 7.0, 1.0, 4.0, 7.0, 7.0, 1.0, 2.5, 5.5, 2.5])
+    expected, _ = ckmeans(values, 3)
+    rng = np.random.default_rng(0)
+    for _ in range(20):
+        order = rng.permutation(len(values))
+        labels, _ = ckmeans(values[order], 3)
+        assert labels.tolist() == expected[order].tolist()
+
+
+def test_ckmeans_rejects_k_above_distinct_values():
+    assert ckmeans([1, 1, 1, 9], 2)[0].tolist() == [0, 0, 0, 1]
+    with pytest.raises(ValueError):
+        ckmeans([1, 1, 1, 9], 3)
+    with pytest.raises(ValueError):
+        ckmeans([1, 2], 0)
+    with pytest.raises(ValueError):
+        ckmeans([], 1)
+
+
+def test_constant_series():
+    labels, centroids = ckmeans([5000] * 12, 1)
+    assert labels.tolist() == [0] * 12
+    assert centroids.tolist() == [5000.0]
+    with pytest.raises(ValueError):
+        ckmeans([5000] * 12, 2)
+    with pytest.raises(ValueError):
+        silhouette_1d([5000] * 12, labels)
+
+
+def test_silhouette_singletons_score_zero():
+    # Every point is 1 from its pair; the nearest other cluster is 10, 9, 10 and 11 away
+    values = [0, 1, 10, 20, 21]
+    labels = np.array([0, 0, 1, 2, 2])
+    expected = (1 - 1 / 10) + (1 - 1 / 9) + 0 + (1 - 1 / 10) + (1 - 1 / 11)
+    assert silhouette_1d(values, labels) == pytest.approx(expected / 5)
+
+
+def profiles(count=60, seed=3):
+    rng = np.random.default_rng(seed)
+    months = np.arange(12)
+    for i in range(count):
+        if i % 3 == 0:
+            yield 1e5 * (1 + 0.4 * np.sin((months + rng.integers(12)) / 12 * 2 * np.pi)) + rng.normal(0, 5e3, 12)
+        elif i % 3 == 1:
+            yield rng.uniform(1e3, 1e4, 12) * np.where(rng.random(12) < 0.2, 10, 1)
+        else:
+            yield rng.choice(rng.uniform(1e3, 1e5, 4), 12).round()
+
+
+def test_matches_sklearn():
+    cluster = pytest.importorskip('sklearn.cluster')
+    metrics = pytest.importorskip('sklearn.metrics')
+    for monthly in profiles():
+        k = min(3, len(np.unique(monthly)))
+        labels, _ = ckmeans(monthly, k)
+        reference = cluster.KMeans(n_clusters=k, random_state=42, n_init=10).fit_predict(monthly.reshape(-1, 1))
+        # Exact optimum: never worse than KMeans, which may stop in a local one
+        assert within_ss(monthly, labels) <= within_ss(monthly, reference) * (1 + 1e-9) + 1e-9
+        for candidate in (labels, reference):
+            assert silhouette_1d(monthly, candidate) == pytest.approx(
+                metrics.silhouette_score(monthly.reshape(-1, 1), candidate), abs=1e-9)
@@ -0,0 +1,30 @@
+import openpyxl
+
+from data_processor import DataProcessor, xlsx_cell_text
+
+MONTHS = ['Januari', 'Februari', 'Maret', 'April', 'Mei', 'Juni',
+          'Juli', 'Agustus', 'September', 'Oktober', 'November', 'Desember']
+
+
+def test_xlsx_cell_text_truncates_numbers():
+    assert xlsx_cell_text(1500.5) == '1500'
+    assert xlsx_cell_text(1500) == '1500'
+    assert xlsx_cell_text(2019.0) == '2019'
+    assert xlsx_cell_text(None) == ''
+    assert xlsx_cell_text('1.500') == '1.500'
+
+
+def test_parse_xlsx_truncates_fractional_numeric_cells(tmp_path):
+    path = tmp_path / 'bps_2019.xlsx'
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.append(['Kabupaten/Kota'] + MONTHS)
+    sheet.append(['Palembang', 1500.5] + [100 * month for month in range(2, 13)])
+    sheet.append(['Ogan Ilir', '2.000'] + [1.9] * 11)
+    workbook.save(path)
+
+    values = {(region, month): value for region, _, month, value in DataProcessor().parse_xlsx(str(path))}
+    assert values[('Palembang', 'January')] == 1500
+    assert values[('Palembang', 'December')] == 1200
+    assert values[('Ogan Ilir', 'January')] == 2000
+    assert values[('Ogan Ilir', 'February')] == 1
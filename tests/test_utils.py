@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import VECTORIZE_MIN_CELLS, parse_count, parse_counts
+
+CELLS = ['1.234.567', '1,234,567', '1 234 567', '12,5', '-', '–', '', None, float('nan'),
+         12.7, 5, 'abc', '1–2', 'a\nb 3']
+EXPECTED = [1234567, 1234567, 1234567, 125, 0, 0, 0, 0, 0, 12, 5, 0, 12, 3]
+
+
+def test_parse_count():
+    assert [parse_count(cell) for cell in CELLS] == EXPECTED
+
+
+@pytest.mark.parametrize('repeat', [1, VECTORIZE_MIN_CELLS])
+def test_parse_counts_matches_parse_count(repeat):
+    counts = parse_counts(CELLS * repeat)
+    assert counts.dtype == np.int64
+    assert counts.tolist() == EXPECTED * repeat
+
+
+def test_parse_counts_keeps_every_digit():
+    # Separators are never read as a decimal point: '12,5' is 125, as in the CSV path before
+    assert parse_counts(['12,5'] * VECTORIZE_MIN_CELLS).tolist() == [125] * VECTORIZE_MIN_CELLS
+
+
+@pytest.mark.parametrize('values', [
+    list(range(VECTORIZE_MIN_CELLS)),
+    np.arange(VECTORIZE_MIN_CELLS, dtype=float),
+    pd.Series([str(i) for i in range(VECTORIZE_MIN_CELLS)], index=range(7, 7 + VECTORIZE_MIN_CELLS)),
+])
+def test_parse_counts_without_text_or_with_offset_index(values):
+    assert parse_counts(values).tolist() == list(range(VECTORIZE_MIN_CELLS))
+
+
+def test_parse_counts_empty():
+    assert parse_counts([]).tolist() == []
@@ -0,0 +1,170 @@
+"""
+Read helpers for the monthly tourism series (tourism_data), one series per
+region (regency/city).
+
+``get_series()`` is the entry point for routes and analyzers: a region's
+series is queried once per request and the same DataFrame is shared by every caller in
+that request. Treat it as read-only. All ingestion goes through
+``write_series()``, which merges rows into the table (only changed values are
+written), bumps ``data_version()`` when anything changed and invalidates the
+cached series after it commits.
+"""
+import logging
+import re
+import time
+
+import pandas as pd
+from flask import g, has_app_context
+
+from config import Config
+from database import get_connection
+
+logger = logging.getLogger(__name__)
+
+MONTHS = ['January', 'February', 'March', 'April', 'May', 'June',
+          'July', 'August', 'September', 'October', 'November', 'December']
+
+
+def month_number(month):
+    """1-12 for an English month name (the form stored in tourism_data.month)"""
+    return MONTHS.index(month) + 1
+
+
+# Administrative prefixes dropped so 'Kota Palembang' and 'Palembang' are one region
+REGION_PREFIX_PATTERN = re.compile(r'^(kota|kabupaten|kab\.?)\s+', re.IGNORECASE)
+
+
+def normalize_region(name):
+    """Canonical region name: whitespace collapsed, 'Kota'/'Kabupaten' prefix removed"""
+    name = ' '.join(str(name).split())
+    return REGION_PREFIX_PATTERN.sub('', name) or name
+
+
+# Served entirely from ix_tourism_data_region_series, already in order
+SERIES_QUERY = '''
+    SELECT year, month_num, value
+    FROM tourism_data
+    WHERE region = ? AND month_num IS NOT NULL
+    ORDER BY year, month_num
+'''
+
+
+def load_series(conn, region=None):
+    """Load one region's year x month series as a DataFrame with year, month, value columns"""
+    df = pd.read_sql_query(SERIES_QUERY, conn, params=(region or Config.DEFAULT_REGION,))
+    df.insert(1, 'month', df.pop('month_num').map(lambda n: MONTHS[int(n) - 1]))
+    return df
+
+
+def get_series(db_path=None, region=None):
+    """
+    The year x month series of a region (default Config.DEFAULT_REGION) for
+    the current request, loaded on first use. Outside an app context (CLI
+    scripts, worker threads) it is loaded fresh.
+    """
+    db_path = db_path or Config.DATABASE
+    region = region or Config.DEFAULT_REGION
+    if not has_app_context():
+        return load_series(get_connection(db_path), region)
+
+    if '_tourism_series' not in g:
+        g._tourism_series = {}
+    series = g._tourism_series.get((db_path, region))
+    if series is None:
+        series = load_series(get_connection(db_path), region)
+        g._tourism_series[(db_path, region)] = series
+    return series
+
+
+def list_regions(db_path=None):
+    """Regions with data in tourism_data, alphabetically"""
+    conn = get_connection(db_path or Config.DATABASE)
+    rows = conn.execute('SELECT DISTINCT region FROM tourism_data ORDER BY region').fetchall()
+    return [row[0] for row in rows]
+
+
+def invalidate(db_path=None):
+    """Drop the request's cached series after tourism_data has been written"""
+    if has_app_context() and '_tourism_series' in g:
+        db_path = db_path or Config.DATABASE
+        for key in [key for key in g._tourism_series if key[0] == db_path]:
+            del g._tourism_series[key]
+
+
+# Rows whose stored value is already equal are left alone (no write, not counted in total_changes)
+UPSERT_QUERY = '''
+    INSERT INTO tourism_data (region, year, month, month_num, value) VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT(region, year, month) DO UPDATE SET
+        month_num = excluded.month_num,
+        value = excluded.value
+    WHERE tourism_data.value IS NOT excluded.value
+       OR tourism_data.month_num IS NOT excluded.month_num
+'''
+
+DATA_VERSION_QUERY = "SELECT version FROM data_versions WHERE dataset = 'tourism_data'"
+BUMP_DATA_VERSION_QUERY = '''
+    UPDATE data_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP
+    WHERE dataset = 'tourism_data'
+'''
+
+
+def data_version(db_path=None):
+    """Change counter of tourism_data; equal versions mean equal data"""
+    row = get_connection(db_path or Config.DATABASE).execute(DATA_VERSION_QUERY).fetchone()
+    return row[0] if row else 0
+
+
+def bump_data_version(conn):
+    """Record a change to tourism_data (call inside the writing transaction)"""
+    conn.execute(BUMP_DATA_VERSION_QUERY)
+
+
+def merge_rows(conn, rows, source_files=()):
+    """
+    Upsert rows and record ``source_files`` on ``conn`` without committing or
+    bumping the data version (the caller owns the transaction).
+    Returns (rows, changed).
+    """
+    params = [(normalize_region(region), int(year), month, month_number(month), int(value))
+              for region, year, month, value in rows]
+    before = conn.total_changes
+    conn.executemany(UPSERT_QUERY, params)
+    changed = conn.total_changes - before
+    if source_files:
+        conn.executemany('INSERT INTO uploaded_files (filename, year, sha256) VALUES (?, ?, ?)', source_files)
+    return len(params), changed
+
+
+def write_series(rows, db_path=None, source_files=()):
+    """
+    Merge (region, year, month, value) rows into tourism_data in one
+    transaction: new months are inserted, months whose value differs are
+    updated, equal ones are skipped, and the data version is bumped only if
+    something changed. ``source_files`` are (filename, year, sha256) triples
+    recorded in uploaded_files in the same transaction.
+    Returns {'rows', 'changed', 'seconds', 'rows_per_second'}.
+    """
+    db_path = db_path or Config.DATABASE
+    conn = get_connection(db_path)
+    started = time.perf_counter()
+    try:
+        count, changed = merge_rows(conn, rows, source_files)
+        if changed:
+            bump_data_version(conn)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        invalidate(db_path)
+    elapsed = time.perf_counter() - started
+
+    stats = {
+        'rows': count,
+        'changed': changed,
+        'seconds': round(elapsed, 4),
+        'rows_per_second': int(count / elapsed) if elapsed > 0 else count
+    }
+    logger.info("Merged %d tourism_data rows (%d changed) in %.4fs (%d rows/s)",
+                stats['rows'], changed, elapsed, stats['rows_per_second'])
+    return stats
@@ -0,0 +1,104 @@
+"""
+Content-hash deduplication for uploaded BPS files.
+
+Every upload's SHA-256 is recorded in ``uploaded_files`` and the rows parsed
+from it are cached in ``parsed_uploads`` under that hash, so a file is parsed
+at most once. Uploading the file that was last uploaded for a year again is a
+no-op ("unchanged"); any other file is merged by ``write_series()``, which
+compares it with the stored values and writes only the months that differ.
+"""
+import hashlib
+import json
+import os
+from datetime import datetime
+
+from config import Config
+from database import get_connection
+from tourism_repository import write_series
+
+CHUNK_SIZE = 1024 * 1024
+
+
+class InvalidUpload(Exception):
+    """Raised by a parse function when the file is not a usable BPS table"""
+
+
+def file_sha256(path):
+    """Hex SHA-256 of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cached_rows(conn, sha256):
+    """Parsed (region, year, month, value) rows of a file, or None if never parsed"""
+    row = conn.execute('SELECT rows FROM parsed_uploads WHERE sha256 = ?', (sha256,)).fetchone()
+    return [tuple(r) for r in json.loads(row[0])] if row else None
+
+
+def parsed_hashes(conn):
+    """Hashes of every file with rows in parsed_uploads"""
+    return {row[0] for row in conn.execute('SELECT sha256 FROM parsed_uploads')}
+
+
+def store_rows(conn, sha256, rows, commit=True):
+    conn.execute('INSERT OR REPLACE INTO parsed_uploads (sha256, rows) VALUES (?, ?)',
+                 (sha256, json.dumps(rows)))
+    if commit:
+        conn.commit()
+
+
+def imported_hashes(conn):
+    """Hashes of every upload recorded in uploaded_files"""
+    return {row[0] for row in conn.execute('SELECT DISTINCT sha256 FROM uploaded_files WHERE sha256 IS NOT NULL')}
+
+
+def latest_upload_hash(conn, year):
+    """Hash of the most recent upload recorded for ``year`` (None for pre-hash uploads)"""
+    row = conn.execute(
+        'SELECT sha256 FROM uploaded_files WHERE year = ? ORDER BY id DESC LIMIT 1', (year,)
+    ).fetchone()
+    return row[0] if row else None
+
+
+def with_year(rows, year):
+    """
+    Rows with ``year`` applied: a given upload year overrides every row's
+    year, and only when ``year`` is None do rows keep their own (e.g. the
+    years printed in a PDF).
+    """
+    return [(region, year or row_year, month, value) for region, row_year, month, value in rows]
+
+
+def ingest(filepath, year, parse, db_path=None, filename=None, sha256=None, progress=None):
+    """
+    Merge an uploaded file into tourism_data unless it is the year's last upload again.
+
+    ``parse()`` returns (region, year, month, value) rows (year None = the
+    upload's ``year``) and is only called for content not parsed before.
+    Returns {'status': 'unchanged'|'written', 'rows', 'written', 'cached'}.
+    """
+    db_path = db_path or Config.DATABASE
+    sha256 = sha256 or file_sha256(filepath)
+    record_year = year or datetime.now().year
+    conn = get_connection(db_path)
+
+    latest = latest_upload_hash(conn, record_year)
+    rows = cached_rows(conn, sha256)
+    cached = rows is not None
+    if latest == sha256:
+        return {'status': 'unchanged', 'rows': with_year(rows or [], year), 'written': 0, 'cached': cached}
+
+    if not cached:
+        rows = [(region, row_year, month, int(value)) for region, row_year, month, value in parse()]
+        store_rows(conn, sha256, rows)
+    rows = with_year(rows, year)
+
+    stats = write_series(rows, db_path, source_files=[(filename or os.path.basename(filepath), record_year, sha256)])
+    if progress:
+        progress(rows=stats['changed'])
+
+    return {'status': 'written' if stats['changed'] else 'unchanged', 'rows': rows,
+            'written': stats['changed'], 'cached': cached}
@@ -0,0 +1,66 @@
+"""
+Streaming storage of uploaded files.
+
+``save_upload()`` copies an upload to ``Config.UPLOAD_FOLDER`` in chunks,
+hashing and counting bytes as it goes, after the caller's sniff function has
+accepted the first ``SNIFF_SIZE`` bytes, so a wrong file is rejected before
+anything is written or parsed. ``UploadRequest`` raises Werkzeug's 500KB
+in-memory spool to ``Config.UPLOAD_SPOOL_SIZE``: typical BPS files are
+copied straight from memory, while a large upload spills to a temp file
+instead of holding up to MAX_CONTENT_LENGTH in RAM per request.
+"""
+import hashlib
+import os
+import tempfile
+from datetime import datetime
+
+from flask import Request
+
+from config import Config
+
+SNIFF_SIZE = 1024
+CHUNK_SIZE = 64 * 1024
+
+
+class UploadRejected(Exception):
+    """The upload failed its header check; the message is user-facing"""
+
+
+class UploadRequest(Request):
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return tempfile.SpooledTemporaryFile(max_size=Config.UPLOAD_SPOOL_SIZE, mode='rb+')
+
+
+def save_upload(stream, prefix, suffix, sniff=None, folder=None):
+    """
+    Write ``stream`` to a new file named ``<prefix><timestamp>_<random><suffix>``.
+
+    ``sniff(head)`` gets the first SNIFF_SIZE bytes and returns (valid, message);
+    an invalid head raises UploadRejected before the file is created. The name
+    is reserved with O_EXCL (tempfile.mkstemp), so concurrent uploads cannot
+    collide. The size limit is MAX_CONTENT_LENGTH, enforced by Flask before
+    the request body is parsed. Returns (filepath, filename, sha256, size).
+    """
+    head = stream.read(SNIFF_SIZE)
+    if sniff:
+        valid, message = sniff(head)
+        if not valid:
+            raise UploadRejected(message)
+
+    fd, filepath = tempfile.mkstemp(suffix=suffix, dir=folder or Config.UPLOAD_FOLDER,
+                                    prefix=f"{prefix}{datetime.now().strftime('%Y%m%d_%H%M%S')}_")
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            chunk = head
+            while chunk:
+                size += len(chunk)
+                digest.update(chunk)
+                out.write(chunk)
+                chunk = stream.read(CHUNK_SIZE)
+    except BaseException:
+        os.remove(filepath)
+        raise
+
+    return filepath, os.path.basename(filepath), digest.hexdigest(), size
@@ -1,9 +1,13 @@
 import os
+import re
 import logging
 from datetime import datetime
 from functools import wraps
 import json
 
+import numpy as np
+import pandas as pd
+
 def setup_logging():
     """Setup logging configuration"""
     logging.basicConfig(
@@ -22,6 +26,37 @@ def format_number(num):
     except (ValueError, TypeError):
         return "0"
 
+# Every non-digit is dropped from a count cell, so '.', ',' and spaces grouping thousands are ignored
+NON_DIGIT_PATTERN = re.compile(r'\D')
+# Below this many cells parse_counts() loops in Python instead of building a Series
+VECTORIZE_MIN_CELLS = 64
+
+def parse_count(value):
+    """Visitor count of one cell, cleaned like parse_counts()"""
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return 0
+    if isinstance(value, (int, float, np.number)):
+        return int(value)
+    digits = NON_DIGIT_PATTERN.sub('', str(value))
+    return int(digits) if digits else 0
+
+def parse_counts(values):
+    """
+    Visitor counts of a column of cells as an int64 array, cleaned like
+    parse_count(): every non-digit is dropped from text cells ('1.234.567',
+    '1,234,567' and '1 234 567' are all 1234567, '12,5' is 125), numbers are
+    truncated, and '-', blanks and text are 0. Short columns (PDF tables) are
+    cleaned cell by cell, where building a Series would cost more.
+    """
+    if len(values) < VECTORIZE_MIN_CELLS:
+        return np.array([parse_count(cell) for cell in values], dtype=np.int64)
+    cells = pd.Series(values, dtype=object).reset_index(drop=True)
+    text = cells.map(lambda cell: isinstance(cell, str))
+    counts = pd.to_numeric(cells.where(text, '').str.replace(NON_DIGIT_PATTERN, '', regex=True), errors='coerce')
+    if not text.all():
+        counts = counts.where(text, pd.to_numeric(cells.where(~text), errors='coerce'))
+    return counts.fillna(0).to_numpy(dtype=np.int64)
+
 def calculate_percentage_change(old_value, new_value):
     """Hitung persentase perubahan"""
     if old_value == 0: